@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from db import get_db
+from typing import List, Optional
+from db import get_db, get_activity_revision, get_data_revision
 from activity import service
+from activity.export import export_detections, EXPORT_FORMATS
+from analytics.service import date_range
+from config.service import config_version
+from utils.fast_json import fast_response
+from utils.etag import make_etag, conditional_response
 from activity.schema import (
     ActivityCreate,
     ActivityResponse,
     SyncResponse,
+    QueueResponse,
     SummaryResponse,
     DeleteResponse,
     SyncImagesResponse,
@@ -22,7 +30,7 @@ router = APIRouter(prefix="/activity", tags=["Activity"])
 @router.post("/v1", response_model=DeleteResponse)  # schema is same as that of DeleteResponse
 def create_activity(payload: ActivityCreate, db: Session = Depends(get_db)):
     try:
-        resp = service.create_activity(db, payload.name)
+        resp = service.create_activity(db, payload.name, priority=payload.priority)
         return resp
     except HTTPException as e:
         raise e
@@ -34,9 +42,10 @@ def create_activity(payload: ActivityCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/v1", response_model=List[ActivityResponse])
-def list_activities(db: Session = Depends(get_db)):
+def list_activities(request: Request, response: Response, db: Session = Depends(get_db)):
     try:
-        return service.list_activities(db)
+        etag = make_etag("activities", get_data_revision(db))
+        return conditional_response(request, response, etag, lambda: fast_response(service.list_activities(db)))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -46,10 +55,49 @@ def list_activities(db: Session = Depends(get_db)):
         )
 
 
+# Registered before /v1/{activity_id} so "export" isn't taken for an activity id
+@router.get("/v1/export")
+def export_detections_stream(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson | csv"),
+    activity_id: Optional[List[str]] = Query(None, description="Restrict to these activities (repeatable)"),
+    date_from: Optional[datetime] = Query(None, alias="from", description="Images created at or after"),
+    date_to: Optional[datetime] = Query(None, alias="to", description="Images created before (exclusive)"),
+    gzip: bool = Query(False, description="Gzip the stream (Content-Encoding: gzip) whatever the Accept-Encoding"),
+):
+    """One detection per line for the selected activities / date range, streamed."""
+    date_from, date_to = date_range(date_from, date_to)
+
+    filename = f"detections_{datetime.now().strftime('%Y%m%dT%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        # Already encoded: GZip/Brotli middleware skip responses that carry a Content-Encoding
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_detections(format, activity_id, date_from, date_to, compress=gzip),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers,
+    )
+
+
+@router.get("/v1/queue", response_model=QueueResponse)
+def get_queue_depths(db: Session = Depends(get_db)):
+    try:
+        return service.get_queue_depths(db)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error fetching queue depths: {str(e)}"
+        )
+
+
 @router.get("/v1/{activity_id}", response_model=ActivityResponse)
-def get_activity(activity_id: str, db: Session = Depends(get_db)):
+def get_activity(activity_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
     try:
-        return service.get_activity(db, activity_id)
+        revision = get_activity_revision(db, activity_id)
+        etag = make_etag("activity", activity_id, revision) if revision is not None else None
+        return conditional_response(request, response, etag, lambda: fast_response(service.get_activity(db, activity_id)))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -72,10 +120,25 @@ def sync_images(activity_id: str, db: Session = Depends(get_db)):
         )
 
 
+@router.get("/v1/images/{image_id}/annotated")
+def get_annotated_image(image_id: int, thumb: bool = False, db: Session = Depends(get_db)):
+    try:
+        return service.get_annotated_image(db, image_id, thumb=thumb)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error fetching annotated image: {str(e)}"
+        )
+
+
 @router.get("/v1/{activity_id}/summary", response_model=SummaryResponse)
-def get_activity_summary(activity_id: str, db: Session = Depends(get_db)):
+def get_activity_summary(activity_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
     try:
-        return service.get_activity_summary(db, activity_id)
+        revision = get_activity_revision(db, activity_id)
+        etag = make_etag("activity-summary", activity_id, revision) if revision is not None else None
+        return conditional_response(request, response, etag, lambda: service.get_activity_summary(db, activity_id))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -144,9 +207,12 @@ def list_activities_demo(db: Session = Depends(get_db)):
 
 # Get activity by id
 @router.get("/{activity_id}", response_model=ActivityDetailResponse)
-def get_activity_demo(activity_id: str, db: Session = Depends(get_db)):
+def get_activity_demo(activity_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
     try:
-        return service.get_activity_demo(db, activity_id)
+        # The detail view buckets detections by the configured thresholds
+        revision = get_activity_revision(db, activity_id)
+        etag = make_etag("activity-detail", activity_id, revision, config_version()) if revision is not None else None
+        return conditional_response(request, response, etag, lambda: fast_response(service.get_activity_demo(db, activity_id)))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -0,0 +1,145 @@
+"""
+Streaming detections export: one detection per line as NDJSON or CSV.
+
+Rows are read with yield_per (a server-side cursor on Postgres), so memory
+stays flat regardless of how much is exported. The generator opens its own
+session because the request's session is closed before a streamed body is
+sent.
+
+With compress=True the body is gzipped here and sent with Content-Encoding:
+gzip, which the compression middleware leaves alone.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from analytics.service import _sqlite_timestamp, _utc_timestamp
+from db import SessionLocal, ActivityImage
+from utils.fast_json import dumps
+from utils.logger import log_audit
+
+LOG_PATH = "data/logs/audit.log"
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+CSV_COLUMNS = [
+    "activity_id", "image_id", "filename", "image_created_at", "image_status",
+    "detection_id", "class", "confidence", "x1", "y1", "x2", "y2",
+]
+
+_YIELD_PER = 1000        # rows fetched per round trip
+_CHUNK_LINES = 500       # lines per yielded chunk
+
+
+def _detection_rows(activity_ids: Optional[List[str]], date_from: Optional[datetime],
+                    date_to: Optional[datetime]) -> Iterator[dict]:
+    db = SessionLocal()
+    try:
+        query = db.query(
+            ActivityImage.id,
+            ActivityImage.activity_id,
+            ActivityImage.filename,
+            ActivityImage.created_at,
+            ActivityImage.status,
+            ActivityImage.detections,
+        )
+        if activity_ids:
+            query = query.filter(ActivityImage.activity_id.in_(activity_ids))
+        # SQLite compares created_at as text: bind the bounds in the stored layout
+        timestamp = _sqlite_timestamp if db.get_bind().dialect.name == "sqlite" else _utc_timestamp
+        if date_from is not None:
+            query = query.filter(ActivityImage.created_at >= timestamp(date_from))
+        if date_to is not None:
+            query = query.filter(ActivityImage.created_at < timestamp(date_to))
+        query = query.order_by(ActivityImage.id).execution_options(yield_per=_YIELD_PER)
+
+        for image_id, activity_id, filename, created_at, status, detections in query:
+            if not isinstance(detections, list):
+                continue
+            created = created_at.isoformat() if created_at else None
+            for det in detections:
+                bbox = det.get("bbox") or {}
+                yield {
+                    "activity_id": activity_id,
+                    "image_id": image_id,
+                    "filename": filename,
+                    "image_created_at": created,
+                    "image_status": status,
+                    "detection_id": det.get("id"),
+                    "class": det.get("class"),
+                    "confidence": det.get("confidence"),
+                    "x1": bbox.get("x1"),
+                    "y1": bbox.get("y1"),
+                    "x2": bbox.get("x2"),
+                    "y2": bbox.get("y2"),
+                }
+    finally:
+        db.close()
+
+
+def _ndjson_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) >= _CHUNK_LINES:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _csv_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= _CHUNK_LINES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_detections(fmt: str, activity_ids: Optional[List[str]] = None, date_from: Optional[datetime] = None,
+                      date_to: Optional[datetime] = None, compress: bool = False) -> Iterator[bytes]:
+    """Body chunks of a detections export; `fmt` is a key of EXPORT_FORMATS."""
+    rows = _detection_rows(activity_ids, date_from, date_to)
+    chunks = _ndjson_chunks(rows) if fmt == "ndjson" else _csv_chunks(rows)
+    if compress:
+        chunks = _gzip_chunks(chunks)
+
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+        log_audit(f"Detections export ({fmt}{', gzip' if compress else ''}) finished: {sent} bytes; "
+                  f"activities={activity_ids or 'all'}, from={date_from}, to={date_to}", LOG_PATH)
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated body
+        log_audit(f"Detections export failed after {sent} bytes; Error: {str(e)}", LOG_PATH)
+        raise
+    finally:
+        # On a client disconnect we are closed mid-stream; close the row generator
+        # too, so its session (and server-side cursor) goes back to the pool now
+        chunks.close()
+        rows.close()
@@ -4,6 +4,7 @@ from datetime import datetime
 
 class ActivityCreate(BaseModel):
     name: str
+    priority: Optional[int] = Field(None, ge=1, le=10)   # detector share while syncing; default 1
 
 class ImageResponse(BaseModel):
     id: int
@@ -11,6 +12,8 @@ class ImageResponse(BaseModel):
     status: str
     original_blob_url: Optional[str]
     annotated_blob_url: Optional[str]
+    original_thumb_url: Optional[str] = None
+    annotated_thumb_url: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -23,6 +26,7 @@ class ActivityResponse(BaseModel):
     created_at: datetime
     from_value: Optional[str]
     to_value:Optional[str]
+    priority: Optional[int] = None
     images: List[ImageResponse]
 
     class Config:
@@ -32,9 +36,28 @@ class SyncResponse(BaseModel):
     message: str
     activity_status: str
     new_images_found: int
+    resumed_images: int = 0
     processed_images: int
     error_images: int
 
+class QueueDepth(BaseModel):
+    activity_id: str
+    priority: Optional[int]
+    pending: int         # rows not yet claimed by any worker
+    processing: int      # rows leased by some worker
+    queued: int          # waiting for the detector in this worker
+    running: int         # on the detector in this worker
+
+class QueueResponse(BaseModel):
+    inference_workers: int
+    queued: int                       # images waiting for the detector in this worker
+    max_queue: int                    # past this, new syncs get 429
+    batch_size: int                   # current adaptive batch size
+    flush_timeout_ms: float
+    batch_latency_ms: Optional[float]
+    latency_target_ms: float
+    activities: List[QueueDepth]
+
 class DefectImageSummary(BaseModel):
     filename: str
     original_blob_url: Optional[str]
@@ -138,6 +161,8 @@ class ActivityImageResponse(BaseModel):  # NEW
     status: str
     original_blob_url: Optional[str]
     annotated_blob_url: Optional[str]
+    original_thumb_url: Optional[str] = None
+    annotated_thumb_url: Optional[str] = None
     created_at: datetime
 
 
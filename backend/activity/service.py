@@ -1,12 +1,34 @@
 import os
+import socket
+import time
 import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, UploadFile
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from db import Activity, ActivityImage
+from db import Activity, ActivityImage, DEFAULT_PRIORITY, bump_activity_revision
 from azure.storage.blob import BlobServiceClient, ContentSettings
-from models.detector import detect_defects
+from fastapi.responses import RedirectResponse
+from models.detector import render_annotated, ANNOTATED_CONTENT_TYPE
+from models.scheduler import inference_scheduler
 from utils.logger import log_audit
-from utils.config_loader import load_config
+from utils.metrics import span
+from utils.image_codec import make_thumbnail, with_format_extension
+from analytics.cache import invalidate_analytics_cache
+from analytics.incremental import forget_activity as forget_analytics_activity
+from config.settings import (
+    ANNOTATION_MODE,
+    THUMBNAILS_ENABLED,
+    SYNC_LEASE_SECONDS,
+    SYNC_CLAIM_SIZE,
+    SYNC_MAX_ATTEMPTS,
+    SYNC_RETRY_BACKOFF_SECONDS,
+    INFERENCE_TIMEOUT_SECONDS,
+)
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,6 +45,7 @@ container_client = blob_service_client.get_container_client(CONTAINER_NAME)
 
 ORIGINAL_PREFIX = "original/"
 ANNOTATED_PREFIX = "annotated/"
+THUMBS_PREFIX = "thumbs/"       # thumbs/original/<filename>, thumbs/annotated/<filename>
 
 
 
@@ -30,13 +53,37 @@ def _blob_url(blob_name: str) -> str:
     return container_client.get_blob_client(blob_name).url
 
 
-def create_activity(db: Session, name: str, from_value: str = None, to_value: str = None):
+def _lazy_annotated_url(image_id: int) -> str:
+    return f"/activity/v1/images/{image_id}/annotated"
+
+
+def _upload_thumbnail(source_bytes: bytes, blob_name: str):
+    """Upload a thumbnail of source_bytes under thumbs/; returns its URL or None on failure."""
+    thumb_blob_name = f"{THUMBS_PREFIX}{blob_name}"
+    try:
+        thumb_bytes, content_type = make_thumbnail(source_bytes)
+        thumb_client = container_client.get_blob_client(thumb_blob_name)
+        with span("blob_upload"):
+            thumb_client.upload_blob(
+                thumb_bytes,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=content_type)
+            )
+        return thumb_client.url
+    except Exception as e:
+        log_audit(f"Failed to upload thumbnail {thumb_blob_name}; Error: {str(e)}", "data/logs/audit.log")
+        return None
+
+
+def create_activity(db: Session, name: str, from_value: str = None, to_value: str = None, priority: int = None):
     if not name or not name.strip():
         raise HTTPException(status_code=400, detail="Activity name is required")
     activity_id = str(uuid.uuid4())
-    activity = Activity(id=activity_id, name=name.strip(), status="pending", from_value=from_value,to_value=to_value)
+    activity = Activity(id=activity_id, name=name.strip(), status="pending", from_value=from_value,to_value=to_value,
+                        priority=priority or DEFAULT_PRIORITY)
     db.add(activity)
     db.commit()
+    invalidate_analytics_cache()
     log_audit(f"Created activity: {name}", "data/logs/audit.log")
     return {"message": "Activity created", "activity_id": activity_id}
 
@@ -49,6 +96,9 @@ def list_activities(db: Session):
             "name": a.name,
             "status": a.status,
             "created_at": a.created_at,
+            "from_value": a.from_value,
+            "to_value": a.to_value,
+            "priority": a.priority,
             "images": [
                 {
                     "id": img.id,
@@ -56,6 +106,8 @@ def list_activities(db: Session):
                     "status": img.status,
                     "original_blob_url": img.original_blob_url,
                     "annotated_blob_url": img.annotated_blob_url,
+                    "original_thumb_url": img.original_thumb_url,
+                    "annotated_thumb_url": img.annotated_thumb_url,
                     "created_at": img.created_at,
                 }
                 for img in sorted(a.images, key=lambda i: i.created_at, reverse=True)  # newest first
@@ -74,6 +126,9 @@ def get_activity(db: Session, activity_id: str):
         "name": activity.name,
         "status": activity.status,
         "created_at": activity.created_at,
+        "from_value": activity.from_value,
+        "to_value": activity.to_value,
+        "priority": activity.priority,
         "images": [
             {
                 "id": img.id,
@@ -81,6 +136,8 @@ def get_activity(db: Session, activity_id: str):
                 "status": img.status,
                 "original_blob_url": img.original_blob_url,
                 "annotated_blob_url": img.annotated_blob_url,
+                "original_thumb_url": img.original_thumb_url,
+                "annotated_thumb_url": img.annotated_thumb_url,
                 "created_at": img.created_at,
             }
             for img in sorted(activity.images, key=lambda i: i.created_at, reverse=True)  # newest first
@@ -88,94 +145,344 @@ def get_activity(db: Session, activity_id: str):
     }
 
 
-def sync_images(db: Session, activity_id: str):
-    activity = db.query(Activity).filter_by(id=activity_id).first()
-    if not activity:
-        raise HTTPException(status_code=404, detail="Activity not found")
+def _lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=SYNC_LEASE_SECONDS)
 
-    activity.status = "in-progress"
+
+def _pending(now: datetime):
+    # Rows that failed before wait out their back-off
+    return and_(
+        ActivityImage.status == "pending",
+        or_(ActivityImage.retry_at.is_(None), ActivityImage.retry_at <= now),
+    )
+
+
+def _stale(now: datetime):
+    # Claimed by a worker whose lease ran out (rows stuck before leases existed have none)
+    return and_(
+        ActivityImage.status == "processing",
+        or_(ActivityImage.lease_expires_at.is_(None), ActivityImage.lease_expires_at <= now),
+    )
+
+
+def _register_pending(db: Session, activity_id: str, filenames) -> int:
+    """Insert a "pending" row per new blob; rows another worker registered first are left alone."""
+    known = {name for (name,) in db.query(ActivityImage.filename).filter_by(activity_id=activity_id)}
+    db.commit()   # end the read so SQLite takes the write lock fresh (and waits for it) below
+    rows = [
+        {"activity_id": activity_id, "filename": name, "status": "pending", "original_blob_url": _blob_url(f"{ORIGINAL_PREFIX}{name}")}
+        for name in dict.fromkeys(filenames) if name not in known
+    ]
+    if not rows:
+        return 0
+
+    table = ActivityImage.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert_fn = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        # The unique (activity_id, filename) index settles races between workers
+        result = db.execute(insert_fn(table).on_conflict_do_nothing(index_elements=["activity_id", "filename"]), rows)
+        registered = result.rowcount if result.rowcount >= 0 else len(rows)
+    else:
+        registered = 0
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(table.insert().values(**row))
+                registered += 1
+            except IntegrityError:
+                pass
+    bump_activity_revision(db, activity_id)
     db.commit()
-    log_audit(f"Listing blobs of activity: {activity_id} successfully", "data/logs/audit.log")
+    return registered
+
+
+def _claim(db: Session, activity_id: str, owner: str, condition, size: int):
+    # A single UPDATE ... WHERE id IN (SELECT ... LIMIT n), so two workers can never claim the
+    # same row; on Postgres FOR UPDATE SKIP LOCKED also keeps concurrent claimers off each other's rows
+    ids = (
+        select(ActivityImage.id)
+        .where(ActivityImage.activity_id == activity_id, condition)
+        .order_by(ActivityImage.id)
+        .limit(size)
+        .with_for_update(skip_locked=True)
+    )
+    table = ActivityImage.__table__
+    result = db.execute(
+        update(table)
+        .where(table.c.id.in_(ids), condition)
+        .values(status="processing", lease_owner=owner, lease_expires_at=_lease_expiry())
+        .returning(table.c.id)
+        .execution_options(skip_revision=True)   # _claim_chunk bumps once per chunk
+    )
+    return [row.id for row in result]
+
+
+def _claim_chunk(db: Session, activity_id: str, owner: str, size: int):
+    """
+    Lease up to `size` rows of the activity to `owner`, stale ones first.
+    Returns (claimed images, how many of them were reclaimed from a dead worker).
+    """
+    db.commit()
+    now = datetime.now(timezone.utc)
+    stale_ids = _claim(db, activity_id, owner, _stale(now), size)
+    pending_ids = _claim(db, activity_id, owner, _pending(now), size - len(stale_ids)) if len(stale_ids) < size else []
+    if stale_ids or pending_ids:
+        bump_activity_revision(db, activity_id)
+    db.commit()
+    if not stale_ids and not pending_ids:
+        return [], 0
 
-    try:
-        blobs = list(container_client.list_blobs(name_starts_with=ORIGINAL_PREFIX))
-    except Exception as e:
-        log_audit(f"Failed to list blobs of activity {activity_id}; Error: {str(e)}", "data/logs/audit.log")
-        raise HTTPException(status_code=502, detail="Failed to list blobs from container")
+    images = db.query(ActivityImage).filter(ActivityImage.id.in_(stale_ids + pending_ids)).order_by(ActivityImage.id).all()
+    return images, len(stale_ids)
 
-    new_count, processed_count, error_count = 0, 0, 0
 
-    for blob in blobs:
-        filename_only = blob.name.split("/")[-1]
-        exists = db.query(ActivityImage).filter_by(filename=filename_only, activity_id=activity_id).first()
-        if exists:
-            continue
+def _heartbeat(db: Session, owner: str):
+    """Extend the leases of every row `owner` still holds."""
+    db.execute(
+        update(ActivityImage)
+        .where(ActivityImage.lease_owner == owner, ActivityImage.status == "processing")
+        .values(lease_expires_at=_lease_expiry())
+        .execution_options(synchronize_session=False, skip_revision=True)
+    )
+    db.commit()
 
-        new_count += 1
-        image = ActivityImage(activity_id=activity_id, filename=filename_only, status="processing")
-        db.add(image)
-        db.commit()
 
-        try:
-            # Original blob URL
-            original_blob_name = f"{ORIGINAL_PREFIX}{filename_only}"
-            image.original_blob_url = _blob_url(original_blob_name)
-            db.commit()
+class _LeaseKeeper:
+    """Heartbeats `owner`'s leases every half lease, including while waiting on the detector queue."""
 
-            # Download original image bytes
-            original_blob = container_client.get_blob_client(original_blob_name)
-            image_bytes = original_blob.download_blob().readall()
+    def __init__(self, db: Session, owner: str):
+        self.db = db
+        self.owner = owner
+        self.last = time.monotonic()
 
-            # Run defect detection
-            result = detect_defects(image_bytes)
-            detections = result.get("detections", [])
-            annotated_bytes = result.get("result_image_bytes", b"")
+    def tick(self):
+        if time.monotonic() - self.last >= SYNC_LEASE_SECONDS / 2:
+            _heartbeat(self.db, self.owner)
+            self.last = time.monotonic()
 
-            # Severity counts
-            high = sum(1 for d in detections if d.get("confidence", 0) >= 0.8)
-            medium = sum(1 for d in detections if 0.5 <= d.get("confidence", 0) < 0.8)
-            low = sum(1 for d in detections if d.get("confidence", 0) < 0.5)
+    def wait(self, future: Future):
+        while True:
+            try:
+                return future.result(timeout=SYNC_LEASE_SECONDS / 4)
+            except FutureTimeout:
+                self.tick()
 
-            image.high_defects = high
-            image.medium_defects = medium
-            image.low_defects = low
-            image.detections = detections
 
-            if detections and annotated_bytes:
-                annotated_blob_name = f"{ANNOTATED_PREFIX}{filename_only}"
-                annotated_client = container_client.get_blob_client(annotated_blob_name)
+def _start_image(db: Session, image: ActivityImage, priority: int, leases: _LeaseKeeper) -> dict:
+    """
+    First half of processing a leased row: fetch what it still needs and queue
+    its inference on the fair scheduler. Steps a previous attempt finished are reused.
+    """
+    lazy = ANNOTATION_MODE == "lazy"
+    filename_only = image.filename
+
+    # Original blob URL
+    original_blob_name = f"{ORIGINAL_PREFIX}{filename_only}"
+    if not image.original_blob_url:
+        image.original_blob_url = _blob_url(original_blob_name)
+        db.commit()
+
+    # A resumed row keeps whatever the previous attempt already stored
+    detections = image.detections
+    annotated_client = container_client.get_blob_client(f"{ANNOTATED_PREFIX}{filename_only}")
+    annotated_uploaded = bool(detections) and not lazy and annotated_client.exists()
+    annotated_bytes = b""
+    if annotated_uploaded and THUMBNAILS_ENABLED and not image.annotated_thumb_url:
+        # Only the annotated thumbnail still needs the bytes
+        with span("blob_download"):
+            annotated_bytes = annotated_client.download_blob().readall()
+
+    image_bytes = None
+    needs_render = detections and not lazy and not annotated_uploaded
+    if detections is None or needs_render or (THUMBNAILS_ENABLED and not image.original_thumb_url):
+        # Download original image bytes
+        original_blob = container_client.get_blob_client(original_blob_name)
+        with span("blob_download"):
+            image_bytes = original_blob.download_blob().readall()
+        if THUMBNAILS_ENABLED and not image.original_thumb_url:
+            image.original_thumb_url = _upload_thumbnail(image_bytes, original_blob_name)
+
+    future = None
+    if detections is None:
+        # Run defect detection (annotated image deferred in lazy mode)
+        # A full detector queue blocks here; keep heartbeating the chunk's leases meanwhile
+        future = inference_scheduler.submit(image.activity_id, priority, image_bytes, render=not lazy, on_wait=leases.tick)
+    return {
+        "image_bytes": image_bytes,
+        "detections": detections,
+        "annotated_bytes": annotated_bytes,
+        "annotated_uploaded": annotated_uploaded,
+        "future": future,
+    }
+
+
+def _finish_image(db: Session, image: ActivityImage, state: dict, leases: _LeaseKeeper):
+    """Second half: wait for the detector, upload the annotated image and store the outcome."""
+    lazy = ANNOTATION_MODE == "lazy"
+    detections = state["detections"]
+    annotated_bytes = state["annotated_bytes"]
+
+    if state["future"] is not None:
+        result = leases.wait(state["future"])
+        detections = result.get("detections", [])
+        annotated_bytes = result.get("result_image_bytes", b"")
+        # Keep the model output so a crash past this point doesn't re-run inference
+        image.detections = detections
+        db.commit()
+    elif detections and not lazy and not state["annotated_uploaded"]:
+        annotated_bytes = render_annotated(state["image_bytes"], detections)
+
+    # Severity counts
+    image.high_defects = sum(1 for d in detections if d.get("confidence", 0) >= 0.8)
+    image.medium_defects = sum(1 for d in detections if 0.5 <= d.get("confidence", 0) < 0.8)
+    image.low_defects = sum(1 for d in detections if d.get("confidence", 0) < 0.5)
+
+    annotated_blob_name = f"{ANNOTATED_PREFIX}{image.filename}"
+    if detections and lazy:
+        image.status = "defects_detected"
+        image.annotated_blob_url = _lazy_annotated_url(image.id)
+        if THUMBNAILS_ENABLED:
+            image.annotated_thumb_url = f"{_lazy_annotated_url(image.id)}?thumb=true"
+    elif detections and (annotated_bytes or state["annotated_uploaded"]):
+        if not state["annotated_uploaded"]:
+            annotated_client = container_client.get_blob_client(annotated_blob_name)
+            with span("blob_upload"):
                 annotated_client.upload_blob(
                     annotated_bytes,
                     overwrite=True,
-                    content_settings=ContentSettings(content_type="image/png")  # inline display
+                    content_settings=ContentSettings(content_type=ANNOTATED_CONTENT_TYPE)  # inline display
                 )
-                image.status = "defects_detected"
-                image.annotated_blob_url = _blob_url(annotated_blob_name)
-            else:
-                image.status = "no_defects"
-                image.annotated_blob_url = None
+        image.status = "defects_detected"
+        image.annotated_blob_url = _blob_url(annotated_blob_name)
+        if THUMBNAILS_ENABLED and annotated_bytes:
+            image.annotated_thumb_url = _upload_thumbnail(annotated_bytes, annotated_blob_name)
+    else:
+        image.status = "no_defects"
+        image.annotated_blob_url = None
+        image.annotated_thumb_url = None
 
-            db.commit()
-            processed_count += 1
+    _release(image)
+    db.commit()
 
-        except Exception as e:
-            image.status = "error"
-            db.commit()
-            error_count += 1
-            log_audit(f"Sync Error {str(e)} for {filename_only} in activity {activity_id}", "data/logs/audit.log")
 
-    # Final activity status
+def _admit(activity_id: str):
+    """Turn new syncs away with 429 while the detector queue is full, instead of queueing without bound."""
+    if inference_scheduler.overloaded():
+        retry_after = inference_scheduler.retry_after()
+        log_audit(f"Sync of activity {activity_id} rejected: detector queue full, retry after {retry_after}s", "data/logs/audit.log")
+        raise HTTPException(
+            status_code=429,
+            detail="Detector queue is full, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def _release(image: ActivityImage):
+    image.lease_owner = None
+    image.lease_expires_at = None
+
+
+def _fail_image(db: Session, image: ActivityImage, error: Exception) -> bool:
+    """Back to "pending" with an exponential back-off, or "error" once out of attempts. True when final."""
+    db.rollback()
+    image.attempts = (image.attempts or 0) + 1
+    final = image.attempts >= SYNC_MAX_ATTEMPTS
+    if final:
+        image.status = "error"
+        image.retry_at = None
+    else:
+        image.status = "pending"
+        image.retry_at = datetime.now(timezone.utc) + timedelta(
+            seconds=SYNC_RETRY_BACKOFF_SECONDS * 2 ** (image.attempts - 1)
+        )
+    _release(image)
+    db.commit()
+    outcome = "giving up" if final else f"retrying after {image.retry_at.isoformat()}"
+    log_audit(f"Sync Error {str(error)} for {image.filename} in activity {image.activity_id} "
+              f"(attempt {image.attempts}/{SYNC_MAX_ATTEMPTS}, {outcome})", "data/logs/audit.log")
+    return final
+
+
+def sync_images(db: Session, activity_id: str):
+    """
+    Process the activity's blobs. Safe to run on several nodes at once: every
+    blob gets one "pending" row, workers lease chunks of rows (SYNC_CLAIM_SIZE)
+    and extend the leases while they work, and rows whose lease ran out
+    (worker died) are claimed again by whoever asks next. Inference for each
+    chunk is queued on the fair scheduler, weighted by the activity's priority.
+
+    A failed image goes back to "pending" with a back-off and is retried by
+    the first sync of the activity after it, up to SYNC_MAX_ATTEMPTS. Nothing
+    runs without a sync: rows left "pending" (back-off, or a sync that died
+    before claiming them; see /activity/v1/queue) wait for the next one. To
+    retry images that ran out of attempts, set them back to status 'pending'
+    with attempts = 0 and sync again.
+    """
+    activity = db.query(Activity).filter_by(id=activity_id).first()
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    _admit(activity_id)
+
+    activity.status = "in-progress"
+    priority = activity.priority or DEFAULT_PRIORITY
+    db.commit()
+    log_audit(f"Listing blobs of activity: {activity_id} successfully", "data/logs/audit.log")
+
+    try:
+        with span("blob_list"):
+            blobs = list(container_client.list_blobs(name_starts_with=ORIGINAL_PREFIX))
+    except Exception as e:
+        log_audit(f"Failed to list blobs of activity {activity_id}; Error: {str(e)}", "data/logs/audit.log")
+        raise HTTPException(status_code=502, detail="Failed to list blobs from container")
+
+    new_count = _register_pending(db, activity_id, (blob.name.split("/")[-1] for blob in blobs))
+    processed_count, error_count, resumed_count = 0, 0, 0
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while True:
+        images, resumed = _claim_chunk(db, activity_id, owner, SYNC_CLAIM_SIZE)
+        if not images:
+            break
+        resumed_count += resumed
+        leases = _LeaseKeeper(db, owner)
+
+        # Queue the whole chunk first so the scheduler sees this activity's backlog
+        started = []
+        for image in images:
+            leases.tick()
+            try:
+                started.append((image, _start_image(db, image, priority, leases)))
+            except Exception as e:
+                if _fail_image(db, image, e):
+                    error_count += 1
+
+        for image, state in started:
+            leases.tick()
+            try:
+                _finish_image(db, image, state, leases)
+                processed_count += 1
+            except Exception as e:
+                if _fail_image(db, image, e):
+                    error_count += 1
+
+    # Final activity status (other workers may still hold rows of this activity)
     if error_count > 0:
         activity.status = "error"
     else:
-        all_done = all(img.status in ["no_defects", "defects_detected"] for img in activity.images)
-        activity.status = "completed" if all_done else "in-progress"
+        unfinished = db.query(ActivityImage.id).filter(
+            ActivityImage.activity_id == activity_id,
+            ActivityImage.status.notin_(["no_defects", "defects_detected"]),
+        ).first()
+        activity.status = "completed" if unfinished is None else "in-progress"
     db.commit()
+    invalidate_analytics_cache()
 
     final_resp = {
         "message": "Sync complete",
         "activity_status": activity.status,
         "new_images_found": new_count,
+        "resumed_images": resumed_count,
         "processed_images": processed_count,
         "error_images": error_count,
     }
@@ -183,6 +490,92 @@ def sync_images(db: Session, activity_id: str):
     return final_resp
 
 
+def get_queue_depths(db: Session):
+    """Backlog per activity: unfinished rows across all workers, detector queue of this worker."""
+    backlog = {}
+    rows = (
+        db.query(ActivityImage.activity_id, ActivityImage.status, func.count(ActivityImage.id))
+        .filter(ActivityImage.status.in_(["pending", "processing"]))
+        .group_by(ActivityImage.activity_id, ActivityImage.status)
+    )
+    for activity_id, status, count in rows:
+        backlog.setdefault(activity_id, {"pending": 0, "processing": 0})[status] = count
+    local = {row["activity_id"]: row for row in inference_scheduler.depths()}
+
+    activity_ids = set(backlog) | set(local)
+    priorities = dict(db.query(Activity.id, Activity.priority).filter(Activity.id.in_(activity_ids))) if activity_ids else {}
+    activities = [
+        {
+            "activity_id": activity_id,
+            "priority": priorities.get(activity_id),
+            "pending": backlog.get(activity_id, {}).get("pending", 0),
+            "processing": backlog.get(activity_id, {}).get("processing", 0),
+            "queued": local.get(activity_id, {}).get("queued", 0),
+            "running": local.get(activity_id, {}).get("running", 0),
+        }
+        for activity_id in activity_ids
+    ]
+    activities.sort(key=lambda a: (a["pending"] + a["processing"] + a["queued"], a["activity_id"]), reverse=True)
+    return {**inference_scheduler.stats(), "activities": activities}
+
+
+def get_annotated_image(db: Session, image_id: int, thumb: bool = False):
+    """
+    Serve the annotated image (or its thumbnail) of an activity image, rendering it on first request.
+    The rendered image is uploaded under 'annotated/' (thumbnail under 'thumbs/') and reused afterwards.
+    """
+    image = db.query(ActivityImage).filter_by(id=image_id).first()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not image.detections:
+        raise HTTPException(status_code=404, detail="Image has no detections")
+    if thumb and not THUMBNAILS_ENABLED:
+        raise HTTPException(status_code=404, detail="Thumbnails are disabled")
+
+    # Already rendered: the stored URL points at the blob rather than back at this endpoint
+    stored_url = image.annotated_thumb_url if thumb else image.annotated_blob_url
+    if stored_url and not stored_url.startswith(_lazy_annotated_url(image_id)):
+        return RedirectResponse(url=stored_url)
+
+    annotated_blob_name = f"{ANNOTATED_PREFIX}{image.filename}"
+    annotated_client = container_client.get_blob_client(annotated_blob_name)
+    thumb_client = container_client.get_blob_client(f"{THUMBS_PREFIX}{annotated_blob_name}")
+    target_client = thumb_client if thumb else annotated_client
+
+    thumb_uploaded = False
+    if not target_client.exists():
+        try:
+            if annotated_client.exists():
+                annotated_bytes = annotated_client.download_blob().readall()
+            else:
+                original_blob = container_client.get_blob_client(f"{ORIGINAL_PREFIX}{image.filename}")
+                image_bytes = original_blob.download_blob().readall()
+                annotated_bytes = render_annotated(image_bytes, image.detections)
+                annotated_client.upload_blob(
+                    annotated_bytes,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type=ANNOTATED_CONTENT_TYPE)  # inline display
+                )
+                log_audit(f"Rendered annotated image {image.filename} on demand (image {image_id})", "data/logs/audit.log")
+        except Exception as e:
+            log_audit(f"Failed to render annotated image {image.filename} (image {image_id}); Error: {str(e)}", "data/logs/audit.log")
+            raise HTTPException(status_code=502, detail="Failed to render annotated image")
+
+        if THUMBNAILS_ENABLED:
+            thumb_uploaded = _upload_thumbnail(annotated_bytes, annotated_blob_name) is not None
+            if thumb and not thumb_uploaded:
+                raise HTTPException(status_code=502, detail="Failed to render annotated thumbnail")
+
+    # Point later listings straight at the blobs, so the next request returns early
+    image.annotated_blob_url = annotated_client.url
+    if THUMBNAILS_ENABLED and (thumb or thumb_uploaded):
+        image.annotated_thumb_url = thumb_client.url
+    if db.is_modified(image):
+        db.commit()
+
+    return RedirectResponse(url=target_client.url)
+
+
 def get_activity_summary(db: Session, activity_id: str):
     activity = db.query(Activity).filter_by(id=activity_id).first()
     if not activity:
@@ -219,6 +612,8 @@ def delete_activity(db: Session, activity_id: str):
     db.query(ActivityImage).filter_by(activity_id=activity_id).delete()
     db.query(Activity).filter_by(id=activity_id).delete()
     db.commit()
+    forget_analytics_activity(activity_id)
+    invalidate_analytics_cache()
 
     log_audit(f"Deleted activity {activity_id} successfully (DB only)", "data/logs/audit.log")
     return {"message": "Activity deleted", "activity_id": activity_id}
@@ -235,11 +630,12 @@ async def upload_image(file: UploadFile):
         blob_client = container_client.get_blob_client(blob_name)
 
         data = await file.read()
-        blob_client.upload_blob(
-            data,
-            overwrite=True,
-            content_settings=ContentSettings(content_type=file.content_type)  # inline display
-        )
+        with span("blob_upload"):
+            blob_client.upload_blob(
+                data,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=file.content_type)  # inline display
+            )
 
         log_audit(f"Uploaded image {blob_name} successfully", "data/logs/audit.log")
 
@@ -274,21 +670,41 @@ def delete_activity_blob(db: Session, activity_id: str):
             except Exception as e:
                 log_audit(f"Failed to delete annotated blob {annotated_blob_name} of activity {activity_id}; Error: {str(e)}", "data/logs/audit.log")
 
+        for thumb_url, prefix in ((img.original_thumb_url, ORIGINAL_PREFIX), (img.annotated_thumb_url, ANNOTATED_PREFIX)):
+            if not thumb_url:
+                continue
+            thumb_blob_name = f"{THUMBS_PREFIX}{prefix}{filename_only}"
+            try:
+                container_client.delete_blob(thumb_blob_name)
+            except Exception as e:
+                log_audit(f"Failed to delete thumbnail blob {thumb_blob_name} of activity {activity_id}; Error: {str(e)}", "data/logs/audit.log")
+
     db.query(ActivityImage).filter_by(activity_id=activity_id).delete()
     db.query(Activity).filter_by(id=activity_id).delete()
     db.commit()
+    forget_analytics_activity(activity_id)
+    invalidate_analytics_cache()
 
     log_audit(f"Deleted activity {activity_id} successfully", "data/logs/audit.log")
     return {"message": "Activity deleted", "activity_id": activity_id}
 
 #-----------------------------------------------------------Demo------------------------------------------------------------------------#
 
-from config.service import get_thresholds
+from config.service import get_thresholds, subscribe, DEFAULT_LOW, DEFAULT_HIGH
 from pathlib import Path
 from config.settings import DEMO_FOLDER
-config = load_config()
-low_thr = config["low"]
-high_thr = config["high"]
+from utils.static_files import content_hashed_name
+
+# Kept current by the config store; updated in place on every threshold change
+low_thr = DEFAULT_LOW
+high_thr = DEFAULT_HIGH
+
+def _on_config_change(cfg: dict):
+    global low_thr, high_thr
+    low_thr = cfg.get("low", DEFAULT_LOW)
+    high_thr = cfg.get("high", DEFAULT_HIGH)
+
+subscribe(_on_config_change)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -302,6 +718,7 @@ def create_activity_demo(db: Session, from_value: str = None, to_value: str = No
         activity = Activity(id=activity_id, name=name, status="pending",from_value=from_value, to_value=to_value)
         db.add(activity)
         db.commit()
+        invalidate_analytics_cache()
         db.refresh(activity)
         return activity
     except Exception as e:
@@ -402,6 +819,8 @@ def get_activity_demo(db: Session, activity_id: str):
                     "status": img.status,
                     "original_blob_url": img.original_blob_url,
                     "annotated_blob_url": img.annotated_blob_url,
+                    "original_thumb_url": img.original_thumb_url,
+                    "annotated_thumb_url": img.annotated_thumb_url,
                     "created_at": img.created_at,
                 }
                 for img in images
@@ -428,15 +847,40 @@ def delete_activity_demo(db: Session, activity_id: str):
     db.query(ActivityImage).filter_by(activity_id=activity_id).delete()
     db.query(Activity).filter_by(id=activity_id).delete()
     db.commit()
+    forget_analytics_activity(activity_id)
+    invalidate_analytics_cache()
 
     log_audit(f"Deleted activity {activity_id} successfully (DB only)", "data/logs/audit.log")
     return {"message": "Activity deleted", "activity_id": activity_id}
 
 
+def _demo_inference(activity: Activity, image_bytes: bytes) -> dict:
+    # Demo syncs hold no lease that could be heartbeated; bound the wait and drop the image if it's still queued
+    future = inference_scheduler.submit(
+        activity.id, activity.priority or DEFAULT_PRIORITY, image_bytes, timeout=INFERENCE_TIMEOUT_SECONDS
+    )
+    try:
+        return future.result(timeout=INFERENCE_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        future.cancel()
+        raise
+
+
+def _write_demo_annotated(fname: str, annotated_bytes: bytes) -> Path:
+    # Named after its content, so /demo_images can serve it as immutable; a re-sync
+    # that renders different bytes writes a new file instead of changing this one
+    annotated_path = DEMO_FOLDER / content_hashed_name(with_format_extension(f"annotated_{fname}"), annotated_bytes)
+    if not annotated_path.exists():
+        with open(annotated_path, "wb") as f:
+            f.write(annotated_bytes)
+    return annotated_path
+
+
 def sync_images_demo(db: Session, activity_id: str):
     activity = db.query(Activity).filter_by(id=activity_id).first()
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
+    _admit(activity_id)
 
     activity.status = "in-progress"
     db.commit()
@@ -477,7 +921,7 @@ def sync_images_demo(db: Session, activity_id: str):
             with open(file_path, "rb") as f:
                 image_bytes = f.read()
 
-            result = detect_defects(image_bytes)
+            result = _demo_inference(activity, image_bytes)
             detections = result.get("detections", [])
             annotated_bytes = result.get("result_image_bytes", b"")
 
@@ -491,10 +935,8 @@ def sync_images_demo(db: Session, activity_id: str):
             summary["low_defects"] += image.low_defects or 0
 
             if detections and annotated_bytes:
-                annotated_path = DEMO_FOLDER / f"annotated_{fname}"
+                annotated_path = _write_demo_annotated(fname, annotated_bytes)
                 print(annotated_path)
-                with open(annotated_path, "wb") as f:
-                    f.write(annotated_bytes)
                 image.status = "defects_detected"
                 image.annotated_blob_url = annotated_path.as_posix()
                 print(image.annotated_blob_url)
@@ -518,6 +960,7 @@ def sync_images_demo(db: Session, activity_id: str):
 
     activity.status = "completed"
     db.commit()
+    invalidate_analytics_cache()
     db.refresh(activity)
     images = db.query(ActivityImage).filter_by(activity_id=activity_id).all()
 
@@ -540,6 +983,7 @@ def sync_images_demo2(db: Session, activity_id: str):
     activity = db.query(Activity).filter_by(id=activity_id).first()
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
+    _admit(activity_id)
 
     activity.status = "in-progress"
     db.commit()
@@ -574,7 +1018,7 @@ def sync_images_demo2(db: Session, activity_id: str):
             with open(file_path, "rb") as f:
                 image_bytes = f.read()
 
-            result = detect_defects(image_bytes)
+            result = _demo_inference(activity, image_bytes)
             detections = result.get("detections", [])
             annotated_bytes = result.get("result_image_bytes", b"")
 
@@ -584,11 +1028,9 @@ def sync_images_demo2(db: Session, activity_id: str):
             image.detections = detections
 
             if detections and annotated_bytes:
-                annotated_path = DEMO_FOLDER / f"annotated_{fname}"
-                with open(annotated_path, "wb") as f:
-                    f.write(annotated_bytes)
+                annotated_path = _write_demo_annotated(fname, annotated_bytes)
                 image.status = "defects_detected"
-                image.annotated_blob_url = f"/demo_images/annotated_{fname}"
+                image.annotated_blob_url = f"/demo_images/{annotated_path.name}"
             else:
                 image.status = "no_defects"
 
@@ -601,6 +1043,7 @@ def sync_images_demo2(db: Session, activity_id: str):
 
     activity.status = "completed"
     db.commit()
+    invalidate_analytics_cache()
     db.refresh(activity)
     images = db.query(ActivityImage).filter_by(activity_id=activity_id).all()
 
@@ -646,5 +1089,7 @@ def create_and_sync(db: Session, from_value: str = None, to_value: str = None):
                 "to":activity.to_value
             }
         }
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed: {str(e)}")
@@ -1,20 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from analytics.schema import AnalyticsSummaryResponse, MonthlyDefectsResponse
-from analytics.service import AnalyticsService
-from db import get_db
+from analytics.service import AnalyticsService, AnalyticsFilter, date_range
+from db import get_db, get_data_revision
+from config.service import config_version
+from utils.etag import make_etag, conditional_response
 from utils.logger import log_audit
 
 LOG_PATH = "data/logs/audit.log"
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+def analytics_scope(
+    date_from: Optional[datetime] = Query(None, alias="from", description="Only images created at or after this date/time"),
+    date_to: Optional[datetime] = Query(None, alias="to", description="Only images created before this date/time (exclusive)"),
+    activity_id: Optional[List[str]] = Query(None, description="Restrict to these activities (repeatable)"),
+    class_name: Optional[List[str]] = Query(None, alias="class", description="Only count detections of these classes (repeatable)"),
+) -> AnalyticsFilter:
+    # Bounds may mix offsets; compare and store them as naive UTC like created_at
+    date_from, date_to = date_range(date_from, date_to)
+    return AnalyticsFilter.build(date_from, date_to, activity_id, class_name)
+
 @router.get("/summary", response_model=AnalyticsSummaryResponse)
 def get_analytics_summary(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     low_threshold: float = Query(None, gt=0.0, lt=1.0, description="Override low threshold (0-1, exclusive)"),
     high_threshold: float = Query(None, gt=0.0, lt=1.0, description="Override high threshold (0-1, exclusive)"),
+    scope: AnalyticsFilter = Depends(analytics_scope),
 ):
     """
     Dashboard analytics:
@@ -24,13 +42,19 @@ def get_analytics_summary(
       - defect_severity_distribution (low/medium/high)
       - activity_severity_distribution (low/medium/high)
     Thresholds are loaded from config but can be overridden per request.
+    Optional filters: from/to ([from, to) on image created_at), activity_id, class.
     """
     try:
         if low_threshold is not None and high_threshold is not None and not (low_threshold < high_threshold):
             raise HTTPException(status_code=400, detail="low_threshold must be strictly less than high_threshold")
 
+        # The query string is part of the URL the ETag belongs to, so only data and config versions go in
+        etag = make_etag("analytics-summary", get_data_revision(db), config_version())
         service = AnalyticsService(db)
-        summary = service.get_summary(override_low=low_threshold, override_high=high_threshold)
+        summary = conditional_response(
+            request, response, etag,
+            lambda: service.get_summary(override_low=low_threshold, override_high=high_threshold, scope=scope),
+        )
         log_audit("Analytics summary endpoint called successfully", LOG_PATH)
         return summary
 
@@ -42,10 +66,24 @@ def get_analytics_summary(
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.get("/monthly-defects", response_model=MonthlyDefectsResponse)
-def get_monthly_defects(year: int = None, month: int = None, db: Session = Depends(get_db)):
+def get_monthly_defects(
+    request: Request,
+    response: Response,
+    year: int = None,
+    month: int = Query(None, ge=1, le=12),
+    db: Session = Depends(get_db),
+    activity_id: Optional[List[str]] = Query(None, description="Restrict to these activities (repeatable)"),
+    class_name: Optional[List[str]] = Query(None, alias="class", description="Only count detections of these classes (repeatable)"),
+):
     try:
         service = AnalyticsService(db)
-        return service.get_monthly_defects(year=year, month=month)
+        scope = AnalyticsFilter.build(activity_ids=activity_id, classes=class_name)
+        # Without year/month the response follows the calendar, so today's date is part of the version
+        etag = make_etag("monthly-defects", get_data_revision(db), date.today() if not (year and month) else "")
+        return conditional_response(
+            request, response, etag,
+            lambda: service.get_monthly_defects(year=year, month=month, scope=scope),
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
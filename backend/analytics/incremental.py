@@ -0,0 +1,307 @@
+"""
+Materialized running aggregate behind the unfiltered analytics summary.
+
+Per threshold pair we keep low/medium/high counts per (activity, day) for
+every image folded so far, plus a watermark: the highest id looked at. A
+request only reads rows above the watermark, so its cost follows new data,
+not history.
+
+Only rows in a final status are folded. Rows still pending/processing at or
+below the watermark are tracked by id and re-read on each request (a
+non-final range scan; pending rows carry no detections) until they finish,
+so an orphaned "pending" row costs one row per request instead of pinning
+the watermark.
+
+Changes to rows already folded are picked up from the writes themselves,
+never by rescanning history on a request:
+- deletions through the activity service call forget_activity();
+- commits through this process's sessions that change or delete a folded
+  image (a retry setting it back to "pending", a re-sync finishing it again)
+  mark the aggregates that hold it for a rebuild;
+- committed bulk updates of activity_images (query(...).update()) mark
+  every aggregate, since the rows they touched aren't known. Lease-only
+  updates (execution_options(skip_revision=True)) are left out.
+
+What no hook sees (another worker process, raw SQL, bulk deletes outside
+the activity service) is caught by comparing the count and sum of ids of
+the final rows with the folded ones, at most every
+ANALYTICS_CONSISTENCY_CHECK_SECONDS per aggregate; until then such changes
+can be missing from the summary.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+from config.settings import ANALYTICS_CONSISTENCY_CHECK_SECONDS
+from db import ActivityImage
+from utils.logger import log_audit
+
+LOG_PATH = "data/logs/audit.log"
+
+FINAL_STATUSES = ("no_defects", "defects_detected", "error")
+_MAX_AGGREGATES = 4    # threshold pairs kept materialized, LRU beyond that
+
+
+class _Aggregate:
+    def __init__(self, low_thr: float, high_thr: float, check_interval_s: float):
+        self.low_thr = low_thr
+        self.high_thr = high_thr
+        self.lock = threading.Lock()
+        self.groups: Dict[Tuple[str, Optional[str]], List[int]] = {}   # (activity, day) -> [low, medium, high]
+        self.activity_images: Dict[str, List[int]] = {}                # activity -> [folded rows, sum of their ids]
+        self.in_flight: Dict[int, str] = {}                            # image id -> activity, not final yet
+        self.watermark: Optional[int] = None                           # highest id seen; None = needs a rebuild
+        self.stale = False                                             # a folded row changed; rebuild on next use
+        self.check_interval_s = check_interval_s
+        self.checked_at = 0.0                                          # monotonic time of the last full recount
+
+    def _severity(self, detections) -> List[int]:
+        counts = [0, 0, 0]
+        if isinstance(detections, list):
+            for det in detections:
+                conf = float(det.get("confidence") or 0.0)
+                if conf < self.low_thr:
+                    counts[0] += 1
+                elif conf < self.high_thr:
+                    counts[1] += 1
+                else:
+                    counts[2] += 1
+        return counts
+
+    def rebuild(self, service):
+        db = service.db
+        self.stale = False
+        self.checked_at = time.monotonic()
+        watermark = db.query(func.max(ActivityImage.id)).scalar() or 0
+
+        grouped = service._grouped_counts(self.low_thr, self.high_thr, max_image_id=watermark)
+        per_activity = (
+            db.query(ActivityImage.activity_id, func.count(ActivityImage.id), func.sum(ActivityImage.id))
+            .filter(ActivityImage.id <= watermark)
+            .group_by(ActivityImage.activity_id)
+            .all()
+        )
+        self.groups = {(act_id, day): [low, medium, high] for act_id, day, low, medium, high in grouped}
+        self.activity_images = {act_id: [count, int(id_sum or 0)] for act_id, count, id_sum in per_activity}
+        self.in_flight = {}
+        self.watermark = watermark
+
+        # The grouped counts include unfinished rows; take them back out and track them instead
+        for image_id, act_id, detections, created_at, _ in self._open_rows(db, 0):
+            self._add(act_id, created_at, detections, -1)
+            self.activity_images[act_id][0] -= 1
+            self.activity_images[act_id][1] -= image_id
+            self.in_flight[image_id] = act_id
+
+    def _columns(self, db):
+        return db.query(
+            ActivityImage.id,
+            ActivityImage.activity_id,
+            ActivityImage.detections,
+            ActivityImage.created_at,
+            ActivityImage.status,
+        )
+
+    def _open_rows(self, db, low_id: int):
+        return (
+            self._columns(db)
+            .filter(
+                ActivityImage.id >= low_id,
+                ActivityImage.id <= self.watermark,
+                or_(ActivityImage.status.is_(None), ActivityImage.status.notin_(FINAL_STATUSES)),
+            )
+            .all()
+        )
+
+    def _add(self, act_id: str, created_at, detections, sign: int = 1):
+        counts = self._severity(detections)
+        day = created_at.date().isoformat() if created_at else None
+        group = self.groups.setdefault((act_id, day), [0, 0, 0])
+        for k in range(3):
+            group[k] += sign * counts[k]
+
+    def _fold(self, image_id: int, act_id: str, created_at, detections):
+        self._add(act_id, created_at, detections)
+        folded = self.activity_images.setdefault(act_id, [0, 0])
+        folded[0] += 1
+        folded[1] += image_id
+
+    def refresh(self, service) -> list:
+        """Fold finished rows. Returns the groups of the rows still in flight."""
+        db = service.db
+        transient = []
+
+        # Rows that were in flight: whatever is no longer open has finished or been deleted
+        if self.in_flight:
+            still_open = {}
+            for image_id, act_id, detections, created_at, status in self._open_rows(db, min(self.in_flight)):
+                still_open[image_id] = act_id
+                transient.append((act_id, created_at, detections))
+            finished = [image_id for image_id in self.in_flight if image_id not in still_open]
+            for start in range(0, len(finished), 500):
+                chunk = finished[start:start + 500]
+                for image_id, act_id, detections, created_at, status in self._columns(db).filter(ActivityImage.id.in_(chunk)):
+                    self._fold(image_id, act_id, created_at, detections)
+            self.in_flight = still_open
+
+        # New rows above the watermark
+        rows = self._columns(db).filter(ActivityImage.id > self.watermark).order_by(ActivityImage.id).all()
+        for image_id, act_id, detections, created_at, status in rows:
+            self.watermark = max(self.watermark, image_id)
+            if status in FINAL_STATUSES:
+                self._fold(image_id, act_id, created_at, detections)
+            else:
+                self.in_flight[image_id] = act_id
+                transient.append((act_id, created_at, detections))
+
+        return [
+            (act_id, created_at.date().isoformat() if created_at else None, *self._severity(detections))
+            for act_id, created_at, detections in transient
+        ]
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= self.check_interval_s
+
+    def consistent(self, db) -> bool:
+        # Count and sum of ids of the final rows: a delete elsewhere plus the same number of
+        # inserts still changes the sum, and a folded row set back to pending drops out
+        count, id_sum = db.query(func.count(ActivityImage.id), func.sum(ActivityImage.id)).filter(
+            ActivityImage.id <= self.watermark,
+            ActivityImage.status.in_(FINAL_STATUSES),
+        ).one()
+        self.checked_at = time.monotonic()
+        folded_count = sum(folded[0] for folded in self.activity_images.values())
+        folded_sum = sum(folded[1] for folded in self.activity_images.values())
+        return (count or 0) == folded_count and int(id_sum or 0) == folded_sum
+
+    def folded(self, image_id: int) -> bool:
+        # Lock-free on purpose (called after commits); a stale answer costs at worst a
+        # needless rebuild or a change left to the periodic consistent() check
+        return self.watermark is not None and image_id <= self.watermark and image_id not in self.in_flight
+
+    def forget_activity(self, activity_id: str):
+        # Idempotent: safe to call whether or not a rebuild already dropped the rows
+        for key in [key for key in self.groups if key[0] == activity_id]:
+            del self.groups[key]
+        self.activity_images.pop(activity_id, None)
+        self.in_flight = {i: a for i, a in self.in_flight.items() if a != activity_id}
+
+    def snapshot(self) -> list:
+        return [(act_id, day, *counts) for (act_id, day), counts in self.groups.items()]
+
+
+class IncrementalSummary:
+    def __init__(self, max_aggregates: int = _MAX_AGGREGATES, check_interval_s: float = ANALYTICS_CONSISTENCY_CHECK_SECONDS):
+        self.max_aggregates = max_aggregates
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._aggregates: "OrderedDict[Tuple[float, float], _Aggregate]" = OrderedDict()
+
+    def _aggregate(self, low_thr: float, high_thr: float) -> _Aggregate:
+        key = (low_thr, high_thr)
+        with self._lock:
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                aggregate = self._aggregates[key] = _Aggregate(low_thr, high_thr, self.check_interval_s)
+                while len(self._aggregates) > self.max_aggregates:
+                    self._aggregates.popitem(last=False)
+            self._aggregates.move_to_end(key)
+            return aggregate
+
+    def grouped_counts(self, service, low_thr: float, high_thr: float) -> list:
+        """Same rows as AnalyticsService._grouped_counts() over all images, from the running aggregate."""
+        aggregate = self._aggregate(low_thr, high_thr)
+        with aggregate.lock:
+            if aggregate.watermark is None or aggregate.stale:
+                aggregate.rebuild(service)
+            transient = aggregate.refresh(service)
+            if aggregate.check_due() and not aggregate.consistent(service.db):
+                log_audit("Incremental analytics out of sync with activity_images; rebuilding", LOG_PATH)
+                aggregate.rebuild(service)
+                transient = aggregate.refresh(service)
+            return aggregate.snapshot() + transient
+
+    def images_changed(self, image_ids):
+        """Changes to these images were committed; rebuild aggregates that had folded any of them."""
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+        for aggregate in aggregates:
+            if any(aggregate.folded(image_id) for image_id in image_ids):
+                aggregate.stale = True
+
+    def invalidate(self):
+        """Rows changed that can't be told apart; rebuild every aggregate on its next use."""
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+        for aggregate in aggregates:
+            aggregate.stale = True
+
+    def forget_activity(self, activity_id: str):
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+        for aggregate in aggregates:
+            with aggregate.lock:
+                aggregate.forget_activity(activity_id)
+
+    def reset(self):
+        with self._lock:
+            self._aggregates.clear()
+
+
+incremental_summary = IncrementalSummary()
+
+
+def forget_activity(activity_id: str):
+    """Subtract a deleted activity's images from every materialized aggregate."""
+    incremental_summary.forget_activity(activity_id)
+
+
+def reset_incremental_analytics():
+    incremental_summary.reset()
+
+
+# Columns an aggregate reads; leases, URLs and retry bookkeeping don't change it
+_FOLDED_COLUMNS = ("status", "detections", "created_at", "activity_id")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_images(session, flush_context, instances):
+    # Existing rows only: new rows are above every watermark
+    changed = session.info.setdefault("analytics_changed_image_ids", set())
+    for obj in session.deleted:
+        if isinstance(obj, ActivityImage) and obj.id is not None:
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, ActivityImage) and obj.id is not None:
+            attrs = inspect(obj).attrs
+            if any(getattr(attrs, key).history.has_changes() for key in _FOLDED_COLUMNS):
+                changed.add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_updates(orm_execute_state):
+    # Bulk deletes come from the activity service's delete paths, which call forget_activity()
+    if not orm_execute_state.is_update or orm_execute_state.execution_options.get("skip_revision"):
+        return
+    if any(mapper.class_ is ActivityImage for mapper in orm_execute_state.all_mappers):
+        orm_execute_state.session.info["analytics_bulk_update"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_changed_images(session):
+    # After the commit, so a rebuild can't run in between and read the old rows
+    image_ids = session.info.pop("analytics_changed_image_ids", None)
+    if session.info.pop("analytics_bulk_update", False):
+        incremental_summary.invalidate()
+    elif image_ids:
+        incremental_summary.images_changed(image_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_images(session):
+    session.info.pop("analytics_changed_image_ids", None)
+    session.info.pop("analytics_bulk_update", None)
@@ -1,43 +1,317 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from collections import Counter
+from sqlalchemy import bindparam, func, text
+import numpy as np
 
 from db import Activity, ActivityImage
 from config.service import get_thresholds
 from utils.logger import log_audit
+from utils.metrics import span
+from analytics.cache import analytics_cache
+from analytics.incremental import incremental_summary
+from config.settings import ANALYTICS_INCREMENTAL
 
 LOG_PATH = "data/logs/audit.log"
 
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 from calendar import monthrange
 
+# Image rows are encoded as day ordinals (date.toordinal()); NO_DATE marks a missing created_at
+NO_DATE = -1
+
+
+class AnalyticsFilter(NamedTuple):
+    """Scope of an analytics query. Hashable, so it is also part of the cache key."""
+    date_from: Optional[datetime] = None     # inclusive
+    date_to: Optional[datetime] = None       # exclusive
+    activity_ids: Tuple[str, ...] = ()       # empty = all activities
+    classes: Tuple[str, ...] = ()            # empty = all defect classes
+
+    @classmethod
+    def build(cls, date_from=None, date_to=None, activity_ids=None, classes=None) -> "AnalyticsFilter":
+        return cls(date_from, date_to, tuple(sorted(set(activity_ids or ()))), tuple(sorted(set(classes or ()))))
+
+    @property
+    def has_date_range(self) -> bool:
+        return self.date_from is not None or self.date_to is not None
+
+
+NO_FILTER = AnalyticsFilter()
+
+# Per (activity, day) low/medium/high detection counts, computed by the database.
+# The inner query yields one row per detection, plus one row with hit = false for
+# images without (matching) detections, so every image keeps its group.
+_GROUPED_COUNTS_SQL = """
+    SELECT activity_id, day,
+           SUM(CASE WHEN hit AND conf < :low THEN 1 ELSE 0 END) AS low,
+           SUM(CASE WHEN hit AND conf >= :low AND conf < :high THEN 1 ELSE 0 END) AS medium,
+           SUM(CASE WHEN hit AND conf >= :high THEN 1 ELSE 0 END) AS high
+    FROM ({detections}) d
+    GROUP BY activity_id, day
+"""
+
+_DETECTIONS_SQL = {
+    "sqlite": """
+        SELECT ai.activity_id AS activity_id,
+               date(ai.created_at) AS day,
+               (je.key IS NOT NULL{class_filter}) AS hit,
+               COALESCE(json_extract(je.value, '$.confidence'), 0.0) AS conf
+        FROM activity_images ai
+        LEFT JOIN json_each(ai.detections) je
+        {where}
+    """,
+    "postgresql": """
+        SELECT ai.activity_id AS activity_id,
+               CAST(ai.created_at AS DATE) AS day,
+               (je.value IS NOT NULL{class_filter}) AS hit,
+               COALESCE((je.value->>'confidence')::float, 0.0) AS conf
+        FROM activity_images ai
+        LEFT JOIN LATERAL json_array_elements(
+            CASE WHEN json_typeof(ai.detections) = 'array' THEN ai.detections ELSE '[]'::json END
+        ) AS je(value) ON TRUE
+        {where}
+    """,
+}
+
+_CLASS_FILTER_SQL = {
+    "sqlite": " AND json_extract(je.value, '$.class') IN :classes",
+    "postgresql": " AND (je.value->>'class') IN :classes",
+}
+
+# (activity_id, "YYYY-MM-DD" or None, low, medium, high)
+GroupedRow = Tuple[str, Optional[str], int, int, int]
+
+def _day_str(day) -> Optional[str]:
+    # SQLite returns 'YYYY-MM-DD' strings, Postgres returns date objects
+    if day is None:
+        return None
+    return day if isinstance(day, str) else day.isoformat()
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """created_at is stored as naive UTC: aware values are converted, naive ones are taken as UTC."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def date_range(date_from: Optional[datetime], date_to: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """from/to query parameters as naive UTC; 422 unless 'from' is strictly before 'to'."""
+    date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+    if date_from is not None and date_to is not None and not (date_from < date_to):
+        raise HTTPException(status_code=422, detail="'from' must be strictly before 'to'")
+    return date_from, date_to
+
+def _sqlite_timestamp(value: datetime) -> str:
+    # created_at is stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text in UTC. Compare
+    # against the same layout so the raw column (and its index) can be used;
+    # a bare date sorts before every timestamp of that day.
+    value = naive_utc(value)
+    if value.time() == datetime.min.time():
+        return value.strftime("%Y-%m-%d")
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S")
+
+def _utc_timestamp(value: datetime) -> datetime:
+    # Aware, so a timestamptz comparison doesn't depend on the session time zone
+    return naive_utc(value).replace(tzinfo=timezone.utc)
+
 class AnalyticsService:
     def __init__(self, db: Session):
         self.db = db
 
+    @property
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    @property
+    def _timestamp(self):
+        """Bind value for a created_at bound: SQLite compares the stored text, so bind the same layout."""
+        return _sqlite_timestamp if self._dialect == "sqlite" else _utc_timestamp
+
+    @staticmethod
+    def _flatten(rows: Sequence, classes: Tuple[str, ...] = ()) -> Dict[str, np.ndarray]:
+        """
+        One pass over (activity_id, detections, created_at) rows into flat arrays:
+          confidences / image_index: one entry per detection
+          activity_ids / day_ordinals: one entry per image
+        """
+        confidences: List[float] = []
+        image_index: List[int] = []
+        activity_ids: List[str] = []
+        day_ordinals: List[int] = []
+
+        for i, (act_id, detections, created_at) in enumerate(rows):
+            activity_ids.append(act_id)
+            day_ordinals.append(created_at.toordinal() if created_at else NO_DATE)
+            if detections and classes:
+                detections = [det for det in detections if det.get("class") in classes]
+            if detections:
+                confidences.extend(float(det.get("confidence", 0.0)) for det in detections)
+                image_index.extend([i] * len(detections))
+
+        return {
+            "confidences": np.asarray(confidences, dtype=np.float64),
+            "image_index": np.asarray(image_index, dtype=np.int64),
+            "activity_ids": np.asarray(activity_ids, dtype=object),
+            "day_ordinals": np.asarray(day_ordinals, dtype=np.int64),
+        }
+
     @staticmethod
-    def _compute_image_counts(
-        detections: Optional[List[Dict]], low_thr: float, high_thr: float
-    ) -> Tuple[int, int, int]:
-        """Compute low/medium/high defect counts dynamically from detections JSON."""
-        if not detections:
-            return 0, 0, 0
-
-        low = medium = high = 0
-        for det in detections:
-            conf = float(det.get("confidence", 0.0))
-            if conf >= high_thr:
-                high += 1
-            elif conf >= low_thr:
-                medium += 1
+    def _severity_counts(flat: Dict[str, np.ndarray], low_thr: float, high_thr: float) -> np.ndarray:
+        """(n_images, 3) array of low/medium/high defect counts per image."""
+        n_images = len(flat["day_ordinals"])
+        # 0: conf < low, 1: low <= conf < high, 2: conf >= high
+        severity = np.digitize(flat["confidences"], [low_thr, high_thr])
+        counts = np.bincount(flat["image_index"] * 3 + severity, minlength=n_images * 3)
+        return counts.reshape(n_images, 3)
+
+    def _image_query(self, scope: AnalyticsFilter, *columns, max_image_id: Optional[int] = None):
+        """ORM query over activity_images restricted to `scope` (class filter excluded)."""
+        query = self.db.query(*columns)
+        if max_image_id is not None:
+            query = query.filter(ActivityImage.id <= max_image_id)
+        timestamp = self._timestamp
+        if scope.date_from is not None:
+            query = query.filter(ActivityImage.created_at >= timestamp(scope.date_from))
+        if scope.date_to is not None:
+            query = query.filter(ActivityImage.created_at < timestamp(scope.date_to))
+        if scope.activity_ids:
+            query = query.filter(ActivityImage.activity_id.in_(scope.activity_ids))
+        return query
+
+    def _grouped_counts_python(
+        self, low_thr: float, high_thr: float, scope: AnalyticsFilter, max_image_id: Optional[int] = None
+    ) -> List[GroupedRow]:
+        """Fallback for databases without JSON table functions: same rows as the SQL path, via NumPy."""
+        rows = self._image_query(
+            scope,
+            ActivityImage.activity_id,
+            ActivityImage.detections,
+            ActivityImage.created_at,
+            max_image_id=max_image_id,
+        ).all()
+        flat = self._flatten(rows, scope.classes)
+        image_counts = self._severity_counts(flat, low_thr, high_thr)
+
+        activity_keys, activity_index = np.unique(flat["activity_ids"], return_inverse=True)
+        day_keys, day_index = np.unique(flat["day_ordinals"], return_inverse=True)
+        groups, group_index = np.unique(activity_index * len(day_keys) + day_index, return_inverse=True)
+        sums = np.stack(
+            [np.bincount(group_index, weights=image_counts[:, k], minlength=len(groups)) for k in range(3)], axis=1
+        ) if len(groups) else np.zeros((0, 3))
+
+        grouped: List[GroupedRow] = []
+        for group, (low, medium, high) in zip(groups.tolist(), sums.tolist()):
+            ordinal = int(day_keys[group % len(day_keys)])
+            day = date.fromordinal(ordinal).isoformat() if ordinal != NO_DATE else None
+            grouped.append((activity_keys[group // len(day_keys)], day, int(low), int(medium), int(high)))
+        return grouped
+
+    def _grouped_counts(
+        self, low_thr: float, high_thr: float, scope: AnalyticsFilter = NO_FILTER, max_image_id: Optional[int] = None
+    ) -> List[GroupedRow]:
+        dialect = self._dialect
+        detections_sql = _DETECTIONS_SQL.get(dialect)
+        if detections_sql is None:
+            return self._grouped_counts_python(low_thr, high_thr, scope, max_image_id)
+
+        timestamp = self._timestamp
+        conditions: List[str] = []
+        params: Dict = {"low": low_thr, "high": high_thr}
+        expanding: List[str] = []
+        if max_image_id is not None:
+            conditions.append("ai.id <= :max_image_id")
+            params["max_image_id"] = max_image_id
+        if scope.date_from is not None:
+            conditions.append("ai.created_at >= :date_from")
+            params["date_from"] = timestamp(scope.date_from)
+        if scope.date_to is not None:
+            conditions.append("ai.created_at < :date_to")
+            params["date_to"] = timestamp(scope.date_to)
+        if scope.activity_ids:
+            conditions.append("ai.activity_id IN :activity_ids")
+            params["activity_ids"] = list(scope.activity_ids)
+            expanding.append("activity_ids")
+        class_filter = ""
+        if scope.classes:
+            class_filter = _CLASS_FILTER_SQL[dialect]
+            params["classes"] = list(scope.classes)
+            expanding.append("classes")
+
+        sql = _GROUPED_COUNTS_SQL.format(detections=detections_sql.format(
+            class_filter=class_filter,
+            where=f"WHERE {' AND '.join(conditions)}" if conditions else "",
+        ))
+        statement = text(sql).bindparams(*(bindparam(name, expanding=True) for name in expanding))
+        rows = self.db.execute(statement, params).all()
+        return [
+            (act_id, _day_str(day), int(low or 0), int(medium or 0), int(high or 0))
+            for act_id, day, low, medium, high in rows
+        ]
+
+    @staticmethod
+    def _shape_summary(grouped: List[GroupedRow]) -> Dict:
+        """Fold (activity, day) groups into the severity, activity and time distributions."""
+        total_low = total_medium = total_high = 0
+        activity_map: Dict[str, List[int]] = {}
+        defects_by_day: Dict[str, int] = {}
+
+        for act_id, day, low, medium, high in grouped:
+            total_low += low
+            total_medium += medium
+            total_high += high
+            counts = activity_map.setdefault(act_id, [0, 0, 0])
+            counts[0] += low
+            counts[1] += medium
+            counts[2] += high
+            if day is not None:
+                defects_by_day[day] = defects_by_day.get(day, 0) + low + medium + high
+
+        defects_by_month: Dict[str, int] = {}
+        defects_by_weekday: Dict[str, int] = {}
+        for day in sorted(defects_by_day):
+            total = defects_by_day[day]
+            parsed = date.fromisoformat(day)
+            month = parsed.strftime("%Y-%m")                # e.g. "2025-11"
+            defects_by_month[month] = defects_by_month.get(month, 0) + total
+            weekday = parsed.strftime("%A")                 # e.g. "Monday"
+            defects_by_weekday[weekday] = defects_by_weekday.get(weekday, 0) + total
+
+        # Classify activities
+        act_low = act_medium = act_high = act_none = 0
+        for l, m, h in activity_map.values():
+            if l == 0 and m == 0 and h == 0:
+                act_none += 1
+            elif h > 0:
+                act_high += 1
+            elif m > 0:
+                act_medium += 1
             else:
-                low += 1
-        return low, medium, high
+                act_low += 1
+
+        return {
+            "defect_severity_distribution": {"low": total_low, "medium": total_medium, "high": total_high},
+            "activity_severity_distribution": {"low": act_low, "medium": act_medium, "high": act_high, "none": act_none},
+            "defects_over_time": dict(sorted(defects_by_day.items())),   # daily trend
+            "defects_by_month": defects_by_month,                        # CHANGE: monthly trend
+            "defects_by_weekday": defects_by_weekday,                    # CHANGE: weekday trend
+        }
 
     def get_summary(
-        self, override_low: Optional[float] = None, override_high: Optional[float] = None
+        self, override_low: Optional[float] = None, override_high: Optional[float] = None,
+        scope: AnalyticsFilter = NO_FILTER
+    ) -> Dict:
+        """
+        Summary over the images in `scope`. With a date range, only activities that
+        have images in the range are counted; the class filter limits which
+        detections count as defects, not which images are included.
+        """
+        key = ("summary", override_low, override_high, scope)
+        return analytics_cache.get_or_compute(key, lambda: self._compute_summary(override_low, override_high, scope))
+
+    @span("analytics_summary")
+    def _compute_summary(
+        self, override_low: Optional[float] = None, override_high: Optional[float] = None,
+        scope: AnalyticsFilter = NO_FILTER
     ) -> Dict:
         try:
             warnings: List[str] = []
@@ -46,92 +320,42 @@ class AnalyticsService:
             low_thr = override_low if override_low is not None else cfg_low
             high_thr = override_high if override_high is not None else cfg_high
 
-            # Totals
-            total_activities = self.db.query(func.count(Activity.id)).scalar() or 0
-            total_images = self.db.query(func.count(ActivityImage.id)).scalar() or 0
-
-            # Fetch detections + created_at
-            all_images = self.db.query(
-                ActivityImage.activity_id,
-                ActivityImage.detections,
-                ActivityImage.created_at
-            ).all()
-
-            total_low = total_medium = total_high = 0
-            activity_map: Dict[str, Dict[str, int]] = {}
-
-            # defects vs time counters
-            defects_by_day = Counter()
-            defects_by_month = Counter()      # CHANGE: added monthly aggregation
-            defects_by_weekday = Counter()    # CHANGE: added weekday aggregation
-
-            for act_id, detections, created_at in all_images:
-                img_low, img_med, img_high = self._compute_image_counts(
-                    detections, low_thr, high_thr
-                )
-                total_low += img_low
-                total_medium += img_med
-                total_high += img_high
-
-                if act_id not in activity_map:
-                    activity_map[act_id] = {"low": 0, "medium": 0, "high": 0}
-                activity_map[act_id]["low"] += img_low
-                activity_map[act_id]["medium"] += img_med
-                activity_map[act_id]["high"] += img_high
-
-                # aggregate defects by day/month/weekday
-                if created_at:
-                    day = created_at.date().isoformat()
-                    defects_by_day[day] += (img_low + img_med + img_high)
-
-                    month = created_at.strftime("%Y-%m")       # e.g. "2025-11"
-                    defects_by_month[month] += (img_low + img_med + img_high)
-
-                    weekday = created_at.strftime("%A")        # e.g. "Monday"
-                    defects_by_weekday[weekday] += (img_low + img_med + img_high)
-
-            total_defects = total_low + total_medium + total_high
+            with span("analytics_query"):
+                # Totals
+                total_images = self._image_query(scope, func.count(ActivityImage.id)).scalar() or 0
 
-            defect_severity_distribution = {
-                "low": total_low,
-                "medium": total_medium,
-                "high": total_high,
-            }
+                if scope == NO_FILTER and ANALYTICS_INCREMENTAL:
+                    grouped = incremental_summary.grouped_counts(self, low_thr, high_thr)
+                else:
+                    grouped = self._grouped_counts(low_thr, high_thr, scope)
 
-            # Classify activities
-            act_low = act_medium = act_high = act_none = 0
-            activities_with_images = set(activity_map.keys())
-
-            for counts in activity_map.values():
-                l, m, h = counts["low"], counts["medium"], counts["high"]
-                if l == 0 and m == 0 and h == 0:
-                    act_none += 1
-                elif h > 0:
-                    act_high += 1
-                elif m > 0:
-                    act_medium += 1
+                activities_without_images = 0
+                if scope.has_date_range:
+                    total_activities = len({row[0] for row in grouped})
                 else:
-                    act_low += 1
-
-            # Activities with no images
-            activities_without_images = (
-                self.db.query(func.count(Activity.id))
-                .filter(~Activity.id.in_(activities_with_images) if activities_with_images else True)
-                .scalar()
-                or 0
-            )
+                    activities = self.db.query(func.count(Activity.id))
+                    if scope.activity_ids:
+                        activities = activities.filter(Activity.id.in_(scope.activity_ids))
+                    total_activities = activities.scalar() or 0
+
+                    # Activities with no images
+                    activities_without_images = (
+                        activities
+                        .outerjoin(ActivityImage, ActivityImage.activity_id == Activity.id)
+                        .filter(ActivityImage.id.is_(None))
+                        .scalar()
+                        or 0
+                    )
+
+            shaped = self._shape_summary(grouped)
+            severity = shaped["defect_severity_distribution"]
+            total_defects = severity["low"] + severity["medium"] + severity["high"]
+
             if activities_without_images > 0:
                 warnings.append(
                     f"{activities_without_images} activities have no images; counted as 'none'."
                 )
-                act_none += activities_without_images
-
-            activity_severity_distribution = {
-                "low": act_low,
-                "medium": act_medium,
-                "high": act_high,
-                "none": act_none,
-            }
+                shaped["activity_severity_distribution"]["none"] += activities_without_images
 
             if src == "default":
                 warnings.append("Using default thresholds; update /config/thresholds to customize.")
@@ -140,11 +364,7 @@ class AnalyticsService:
                 "total_images": total_images,
                 "total_defects": total_defects,
                 "total_activities": total_activities,
-                "defect_severity_distribution": defect_severity_distribution,
-                "activity_severity_distribution": activity_severity_distribution,
-                "defects_over_time": dict(defects_by_day),        # daily trend
-                "defects_by_month": dict(defects_by_month),       # CHANGE: monthly trend
-                "defects_by_weekday": dict(defects_by_weekday),   # CHANGE: weekday trend
+                **shaped,
                 "warnings": warnings or None,
             }
 
@@ -157,51 +377,49 @@ class AnalyticsService:
                 status_code=500,
                 detail=f"Failed to compute analytics summary: {str(e)}"
             )
-        
+
     def get_monthly_defects(
         self, year: Optional[int] = None, month: Optional[int] = None,
-        override_low: Optional[float] = None, override_high: Optional[float] = None
+        override_low: Optional[float] = None, override_high: Optional[float] = None,
+        scope: AnalyticsFilter = NO_FILTER
     ) -> Dict:
         """
         Return daily defect counts for a given month (defaults to current month).
+        The month replaces any date range in `scope`.
         """
+        today = date.today()
+        year = year or today.year
+        month = month or today.month
+        key = ("monthly-defects", year, month, override_low, override_high, scope)
+        return analytics_cache.get_or_compute(
+            key, lambda: self._compute_monthly_defects(year, month, override_low, override_high, scope)
+        )
+
+    @span("analytics_monthly")
+    def _compute_monthly_defects(
+        self, year: int, month: int,
+        override_low: Optional[float] = None, override_high: Optional[float] = None,
+        scope: AnalyticsFilter = NO_FILTER
+    ) -> Dict:
         try:
-            today = date.today()
-            year = year or today.year
-            month = month or today.month
-
-            cfg_low, cfg_high, _ = get_thresholds()
-            low_thr = override_low if override_low is not None else cfg_low
-            high_thr = override_high if override_high is not None else cfg_high
-
-            # Get all images created in this month
-            start_date = date(year, month, 1)
+            # Every detection falls in exactly one of low/medium/high, so the daily
+            # totals don't depend on the thresholds; overrides are accepted for API symmetry
+            start_date = datetime(year, month, 1)
             end_day = monthrange(year, month)[1]
-            end_date = date(year, month, end_day)
+            month_scope = scope._replace(date_from=start_date, date_to=start_date + timedelta(days=end_day))
 
-            all_images = self.db.query(
-                ActivityImage.detections,
-                ActivityImage.created_at
-            ).filter(
-                ActivityImage.created_at >= start_date,
-                ActivityImage.created_at <= end_date
-            ).all()
+            with span("analytics_query"):
+                grouped = self._grouped_counts(0.0, 1.0, month_scope)
+
+            daily: Dict[str, int] = {}
+            for _, day, low, medium, high in grouped:
+                if day is not None:
+                    daily[day] = daily.get(day, 0) + low + medium + high
 
-            # Initialize daily counts
             month_usage: List[Dict] = []
             for day in range(1, end_day + 1):
                 period = date(year, month, day).isoformat()
-                month_usage.append({"period": period, "defect_count": 0})
-
-            # Fill counts
-            for detections, created_at in all_images:
-                if not created_at:
-                    continue
-                day_index = created_at.day - 1
-                img_low, img_med, img_high = self._compute_image_counts(
-                    detections, low_thr, high_thr
-                )
-                month_usage[day_index]["defect_count"] += (img_low + img_med + img_high)
+                month_usage.append({"period": period, "defect_count": daily.get(period, 0)})
 
             result = {"month_usage": month_usage}
             log_audit(f"Monthly defects computed for {year}-{month}", LOG_PATH)
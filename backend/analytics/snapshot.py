@@ -0,0 +1,315 @@
+"""
+Incremental columnar snapshot of activity_images for offline analysis.
+
+Writes Hive-partitioned Parquet under EXPORT_DIR (data/exports/):
+
+    images/month=2025-11/part-000000000100-00000.parquet
+    detections/month=2025-11/part-000000000100-00000.parquet
+    _state.json       {"last_image_id": 250, ...}
+
+images has one row per ActivityImage, and detections one row per detection
+(flattened bbox). pyarrow.dataset, pandas, polars and DuckDB all read the
+directories directly, with month as a partition column.
+
+Each run exports only images with id > last_image_id that are in a final
+status, stopping before the first such image still being processed (logged,
+so an orphaned row doesn't stall the export silently). Exported rows are
+never looked at again: a row changed or reset after its export (a retried
+sync, a deleted activity) is not re-exported; use --full for that.
+
+Part files are named after the run's starting id and batch number; a run
+first deletes parts carrying its own starting id, which only a crashed run
+can have left, so a rerun never duplicates rows. Older parts are never
+rewritten. --full starts over from an empty output. Point --database-url at
+a replica to keep the load off the primary.
+
+Usage (from backend/, needs the optional pyarrow package):
+    python -m analytics.snapshot [--database-url URL] [--batch-size 50000] [--full]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import sessionmaker
+
+from analytics.incremental import FINAL_STATUSES
+from config.settings import EXPORT_DIR
+from db import ActivityImage, DATABASE_URL, make_engine
+from utils.logger import log_audit, flush_audit_log
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # optional: pip install pyarrow
+    pa = pq = None
+
+LOG_PATH = "data/logs/audit.log"
+STATE_FILE = "_state.json"
+UNKNOWN_MONTH = "unknown"
+
+
+def _schemas():
+    images = pa.schema([
+        ("image_id", pa.int64()),
+        ("activity_id", pa.string()),
+        ("filename", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("high_defects", pa.int32()),
+        ("medium_defects", pa.int32()),
+        ("low_defects", pa.int32()),
+        ("detection_count", pa.int32()),
+        ("original_blob_url", pa.string()),
+        ("annotated_blob_url", pa.string()),
+    ])
+    detections = pa.schema([
+        ("image_id", pa.int64()),
+        ("activity_id", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("detection_id", pa.int32()),
+        ("class", pa.string()),
+        ("confidence", pa.float64()),
+        ("x1", pa.int32()),
+        ("y1", pa.int32()),
+        ("x2", pa.int32()),
+        ("y2", pa.int32()),
+    ])
+    return images, detections
+
+
+def load_state(export_dir: str) -> dict:
+    path = os.path.join(export_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_image_id": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(export_dir: str, state: dict):
+    # Same temp-file + rename as config.json, so a crash never leaves half a state file
+    path = os.path.join(export_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _export_watermark(db, start_id: int):
+    """
+    (highest id such that every image in (start_id, id] is in a final status, the open image
+    stopping it or None). Rows at or below start_id are already exported and can't block.
+    """
+    blocking = (
+        db.query(ActivityImage.id, ActivityImage.activity_id, ActivityImage.filename, ActivityImage.status)
+        .filter(
+            ActivityImage.id > start_id,
+            or_(ActivityImage.status.is_(None), ActivityImage.status.notin_(FINAL_STATUSES)),
+        )
+        .order_by(ActivityImage.id)
+        .first()
+    )
+    if blocking is not None:
+        image_id, activity_id, filename, status = blocking
+        log_audit(f"Snapshot stops before image {image_id} ({filename} in activity {activity_id}, "
+                  f"status {status}); re-sync or fix that row to let the export move on", LOG_PATH)
+        return image_id - 1, {"image_id": image_id, "activity_id": activity_id, "filename": filename, "status": status}
+    return db.query(func.max(ActivityImage.id)).scalar() or 0, None
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _part_name(start_id: int, batch: int) -> str:
+    return f"part-{start_id:012d}-{batch:05d}.parquet"
+
+
+def _clear_parts(root: str, start_id: Optional[int] = None):
+    """Drop everything (start_id None) or the parts of a run from start_id that never saved its state."""
+    if start_id is None:
+        for kind in ("images", "detections"):
+            shutil.rmtree(os.path.join(root, kind), ignore_errors=True)
+        return
+    for kind in ("images", "detections"):
+        for path in glob.glob(os.path.join(root, kind, "month=*", f"part-{start_id:012d}-*.parquet")):
+            os.remove(path)
+
+
+def _write_partition(root: str, kind: str, month: str, start_id: int, batch: int, table) -> str:
+    directory = os.path.join(root, kind, f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _part_name(start_id, batch))
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _flush(export_dir: str, months: Dict[str, dict], start_id: int, batch: int, schemas) -> List[str]:
+    images_schema, detections_schema = schemas
+    written = []
+    for month, columns in sorted(months.items()):
+        written.append(_write_partition(
+            export_dir, "images", month, start_id, batch,
+            pa.Table.from_pydict(columns["images"], schema=images_schema),
+        ))
+        if columns["detections"]["image_id"]:
+            written.append(_write_partition(
+                export_dir, "detections", month, start_id, batch,
+                pa.Table.from_pydict(columns["detections"], schema=detections_schema),
+            ))
+    return written
+
+
+def run_snapshot(database_url: str = DATABASE_URL, export_dir: str = EXPORT_DIR,
+                 batch_size: int = 50000, full: bool = False) -> dict:
+    if pa is None:
+        raise RuntimeError("Parquet snapshots need pyarrow: pip install pyarrow")
+
+    os.makedirs(export_dir, exist_ok=True)
+    if full:
+        _clear_parts(export_dir)
+        state = {"last_image_id": 0}
+    else:
+        state = load_state(export_dir)
+    schemas = _schemas()
+
+    engine = make_engine(database_url)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        start_id = state["last_image_id"]
+        end_id, blocked_by = _export_watermark(db, start_id)
+        exported_images = exported_detections = 0
+        files: List[str] = []
+        # Parts named after start_id can only come from a run that crashed before save_state
+        _clear_parts(export_dir, start_id)
+
+        query = (
+            db.query(
+                ActivityImage.id,
+                ActivityImage.activity_id,
+                ActivityImage.filename,
+                ActivityImage.status,
+                ActivityImage.created_at,
+                ActivityImage.high_defects,
+                ActivityImage.medium_defects,
+                ActivityImage.low_defects,
+                ActivityImage.original_blob_url,
+                ActivityImage.annotated_blob_url,
+                ActivityImage.detections,
+            )
+            .filter(ActivityImage.id > start_id, ActivityImage.id <= end_id)
+            .order_by(ActivityImage.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        months: Dict[str, dict] = {}
+        batch = 0
+        for (image_id, activity_id, filename, status, created_at, high, medium, low,
+             original_url, annotated_url, detections) in query:
+            created_at = _naive_utc(created_at)
+            month = created_at.strftime("%Y-%m") if created_at else UNKNOWN_MONTH
+            columns = months.get(month)
+            if columns is None:
+                columns = months[month] = {
+                    "images": {field.name: [] for field in schemas[0]},
+                    "detections": {field.name: [] for field in schemas[1]},
+                }
+            detections = detections if isinstance(detections, list) else []
+
+            img = columns["images"]
+            img["image_id"].append(image_id)
+            img["activity_id"].append(activity_id)
+            img["filename"].append(filename)
+            img["status"].append(status)
+            img["created_at"].append(created_at)
+            img["high_defects"].append(high)
+            img["medium_defects"].append(medium)
+            img["low_defects"].append(low)
+            img["detection_count"].append(len(detections))
+            img["original_blob_url"].append(original_url)
+            img["annotated_blob_url"].append(annotated_url)
+
+            det_cols = columns["detections"]
+            for det in detections:
+                bbox = det.get("bbox") or {}
+                det_cols["image_id"].append(image_id)
+                det_cols["activity_id"].append(activity_id)
+                det_cols["created_at"].append(created_at)
+                det_cols["detection_id"].append(det.get("id"))
+                det_cols["class"].append(det.get("class"))
+                det_cols["confidence"].append(det.get("confidence"))
+                for key in ("x1", "y1", "x2", "y2"):
+                    det_cols[key].append(bbox.get(key))
+                exported_detections += 1
+
+            exported_images += 1
+
+            if exported_images % batch_size == 0:
+                files += _flush(export_dir, months, start_id, batch, schemas)
+                months, batch = {}, batch + 1
+
+        if months:
+            files += _flush(export_dir, months, start_id, batch, schemas)
+
+        # Only advance once every part file is on disk; a crash before this re-exports the same ids
+        # into parts that the next run clears first
+        state = {
+            "last_image_id": max(start_id, end_id),
+            "updated_at": datetime.now().isoformat(),
+            "database": engine.url.render_as_string(hide_password=True),
+        }
+        save_state(export_dir, state)
+    finally:
+        db.close()
+        engine.dispose()
+
+    result = {
+        "from_image_id": start_id,
+        "to_image_id": state["last_image_id"],
+        "images": exported_images,
+        "detections": exported_detections,
+        "files": files,
+        "blocked_by": blocked_by,
+    }
+    log_audit(f"Snapshot exported images {start_id + 1}..{state['last_image_id']}: "
+              f"{exported_images} images, {exported_detections} detections, {len(files)} files", LOG_PATH)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL, help="Defaults to DATABASE_URL; a read replica works")
+    parser.add_argument("--export-dir", default=EXPORT_DIR)
+    parser.add_argument("--batch-size", type=int, default=50000, help="Images per part file (per month)")
+    parser.add_argument("--full", action="store_true", help="Delete the existing parts and export from the start")
+    args = parser.parse_args()
+
+    try:
+        result = run_snapshot(args.database_url, args.export_dir, args.batch_size, args.full)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        flush_audit_log()
+
+    print(f"Exported images {result['from_image_id'] + 1}..{result['to_image_id']}: "
+          f"{result['images']} images, {result['detections']} detections, {len(result['files'])} files")
+    blocked_by = result["blocked_by"]
+    if blocked_by:
+        print(f"Stopped before image {blocked_by['image_id']} ({blocked_by['filename']} in activity "
+              f"{blocked_by['activity_id']}), still {blocked_by['status']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
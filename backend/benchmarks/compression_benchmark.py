@@ -0,0 +1,94 @@
+"""
+Bytes on the wire for typical activity payloads, uncompressed vs compressed.
+
+Seeds throwaway SQLite databases with one activity of N images (same data
+as benchmarks.serialization_benchmark), renders the GET /activity/{id} and
+GET /activity/v1 bodies, and compresses them with gzip at several levels and,
+when the optional brotli package is installed, brotli at several qualities.
+
+Usage (from backend/):
+    python -m benchmarks.compression_benchmark --images 100 1000 10000 --json data/benchmarks/compression.json
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+# activity.service refuses to import without a connection string; the client it builds is never used here
+os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+
+from sqlalchemy.orm import sessionmaker
+
+from activity import service
+from benchmarks.serialization_benchmark import seed
+from db import Base, make_engine
+from utils.fast_json import dumps
+
+try:
+    import brotli
+except ImportError:   # optional
+    brotli = None
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 11)
+
+
+def payloads(images):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{tmp}/compression.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            activity_id = seed(db, images)
+            return {
+                "GET /activity/{activity_id}": dumps(service.get_activity_demo(db, activity_id)),
+                "GET /activity/v1": dumps(service.list_activities(db)),
+            }
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def measure(body):
+    codecs = [(f"gzip-{level}", lambda b, level=level: gzip.compress(b, compresslevel=level)) for level in GZIP_LEVELS]
+    if brotli is not None:
+        codecs += [(f"br-{q}", lambda b, q=q: brotli.compress(b, quality=q)) for q in BROTLI_QUALITIES]
+
+    results = {"identity": {"bytes": len(body), "ratio": 1.0, "ms": 0.0}}
+    for name, compress in codecs:
+        start = time.perf_counter()
+        compressed = compress(body)
+        elapsed = (time.perf_counter() - start) * 1000
+        results[name] = {
+            "bytes": len(compressed),
+            "ratio": round(len(body) / len(compressed), 1),
+            "ms": round(elapsed, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    reports = []
+    for images in args.images:
+        for endpoint, body in payloads(images).items():
+            results = measure(body)
+            reports.append({"images": images, "endpoint": endpoint, "results": results})
+            print(f"{images:>6} images  {endpoint}")
+            for codec, r in results.items():
+                print(f"    {codec:<9} {r['bytes']:>11,} B  x{r['ratio']:<5} {r['ms']:>8} ms")
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(args.json_path) or ".", exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Reader latency while a sync-style writer commits, per engine configuration.
+
+One writer thread inserts activity images and commits once per row, like
+activity.service.sync_images. Reader threads meanwhile run the dashboard
+queries (image count + grouped analytics). Reader latency percentiles, the
+writer's commit rate and any "database is locked" errors are reported for
+each configuration.
+
+For SQLite, "default" is a plain engine (rollback journal, synchronous=FULL)
+and "tuned" uses db.make_engine with the DB_SQLITE_* settings (WAL etc.).
+Other databases run the tuned configuration only.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency --seconds 10 --readers 8 --database-url sqlite:///./data/concurrency.db --json data/benchmarks/db.json
+
+The target database is recreated with Base.metadata and must be throwaway.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from analytics.service import AnalyticsService
+from db import Activity, ActivityImage, Base, make_engine
+
+
+def _detections(rng):
+    return [{"class": "patches", "confidence": round(float(c), 2)} for c in rng.random(int(rng.integers(0, 4)))]
+
+
+def seed(SessionLocal, activities, images_per_activity):
+    rng = np.random.default_rng(0)
+    db = SessionLocal()
+    try:
+        ids = [str(uuid.uuid4()) for _ in range(activities)]
+        db.add_all(Activity(id=i, name=f"bench_{n}", status="completed") for n, i in enumerate(ids))
+        db.add_all(
+            ActivityImage(activity_id=i, filename=f"seed_{n}.png", status="defects_detected", detections=_detections(rng))
+            for i in ids for n in range(images_per_activity)
+        )
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def run(database_url, label, pragmas, seconds, readers, activities, images_per_activity):
+    engine = make_engine(database_url, pragmas=pragmas)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    activity_ids = seed(SessionLocal, activities, images_per_activity)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_ms, commit_ms = [], []
+    errors = {"reader": 0, "writer": 0}
+
+    def writer():
+        rng = np.random.default_rng(1)
+        db = SessionLocal()
+        n = 0
+        try:
+            while not stop.is_set():
+                image = ActivityImage(activity_id=activity_ids[n % len(activity_ids)], filename=f"w_{n}.png", status="processing")
+                try:
+                    db.add(image)
+                    db.commit()
+                    image.detections = _detections(rng)
+                    image.status = "defects_detected"
+                    start = time.perf_counter()
+                    db.commit()
+                    with lock:
+                        commit_ms.append((time.perf_counter() - start) * 1000)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        errors["writer"] += 1
+                n += 1
+        finally:
+            db.close()
+
+    def reader():
+        db = SessionLocal()
+        service = AnalyticsService(db)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    db.query(func.count(ActivityImage.id)).scalar()
+                    service._grouped_counts(0.3, 0.7)
+                    db.rollback()   # end the read transaction like a request would
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        errors["reader"] += 1
+                    continue
+                with lock:
+                    read_ms.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    def _stats(values):
+        if not values:
+            return {"count": 0}
+        arr = np.asarray(values)
+        return {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(arr, 50)), 3),
+            "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3),
+            "max_ms": round(float(arr.max()), 3),
+        }
+
+    return {
+        "database": engine.dialect.name,
+        "config": label,
+        "pragmas": pragmas,
+        "readers": readers,
+        "seconds": seconds,
+        "reads": _stats(read_ms),
+        "writer_commits": _stats(commit_ms),
+        "commits_per_sec": round(len(commit_ms) / seconds, 1),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./data/concurrency.db")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--images-per-activity", type=int, default=500)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.database_url.startswith("sqlite"):
+        # journal_mode is persistent in the file, so the baseline sets it back explicitly
+        configs = [("default", {"journal_mode": "DELETE"}), ("tuned", None)]
+    else:
+        configs = [("tuned", None)]
+
+    reports = []
+    for label, pragmas in configs:
+        report = run(args.database_url, label, pragmas, args.seconds, args.readers,
+                     args.activities, args.images_per_activity)
+        reports.append(report)
+        reads, commits = report["reads"], report["writer_commits"]
+        print(f"[{report['database']}/{label}] reads n={reads['count']} p50={reads.get('p50_ms')} "
+              f"p95={reads.get('p95_ms')} p99={reads.get('p99_ms')} max={reads.get('max_ms')} ms | "
+              f"commits/s={report['commits_per_sec']} p99={commits.get('p99_ms')} ms | errors={report['errors']}")
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(args.json_path) or ".", exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
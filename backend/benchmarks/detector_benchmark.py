@@ -0,0 +1,158 @@
+"""
+Stage-by-stage latency of the inference path in models/detector.py.
+
+Times decode/preprocess, model.predict, postprocess, result.plot, resize and
+encode separately over data/demo_images plus synthetic frames, for each
+combination of batch size and torch thread count. Prints a table and writes
+machine-readable JSON so runs can be diffed across commits.
+
+Usage (from backend/):
+    python -m benchmarks.detector_benchmark --batch-sizes 1 4 8 --threads 1 4 --synthetic 32 --rounds 3 --json data/benchmarks/detector.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+
+from config.settings import DEMO_FOLDER
+from models import detector
+
+STAGES = ["preprocess", "predict", "postprocess", "plot", "resize", "encode"]
+
+
+def load_inputs(synthetic, synthetic_size, seed=0):
+    """Encoded image bytes: the demo images plus `synthetic` random-noise PNG frames."""
+    inputs = []
+    for path in sorted(DEMO_FOLDER.iterdir()):
+        # annotated_* files are outputs of earlier demo syncs, not camera frames
+        if path.suffix.lower() in (".png", ".jpg", ".jpeg") and not path.name.startswith("annotated_"):
+            inputs.append(path.read_bytes())
+
+    rng = np.random.default_rng(seed)
+    for _ in range(synthetic):
+        frame = rng.integers(0, 256, size=(synthetic_size, synthetic_size), dtype=np.uint8)
+        buf = BytesIO()
+        Image.fromarray(frame, mode="L").save(buf, format="PNG")
+        inputs.append(buf.getvalue())
+    return inputs
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def run_config(inputs, batch_size, rounds):
+    """Per-image stage timings (ms) for one batch size; predict is amortized over the batch."""
+    timings = {stage: [] for stage in STAGES}
+    per_image_total = []
+    wall_start = time.perf_counter()
+    processed = 0
+
+    for _ in range(rounds):
+        for offset in range(0, len(inputs), batch_size):
+            batch = inputs[offset:offset + batch_size]
+
+            arrays = []
+            pre_ms = []
+            for image_bytes in batch:
+                array, ms = _timed(detector.preprocess, image_bytes)
+                arrays.append(array)
+                pre_ms.append(ms)
+
+            results, predict_ms = _timed(detector.predict, arrays)
+            predict_per_image = predict_ms / len(batch)
+
+            for result, p_ms in zip(results, pre_ms):
+                _, post_ms = _timed(detector.postprocess, result)
+                result_img, plot_ms = _timed(detector.plot, result)
+                result_pil, resize_ms = _timed(detector.upscale, result_img)
+                _, encode_ms = _timed(detector.encode, result_pil)
+
+                for stage, ms in zip(STAGES, (p_ms, predict_per_image, post_ms, plot_ms, resize_ms, encode_ms)):
+                    timings[stage].append(ms)
+                per_image_total.append(p_ms + predict_per_image + post_ms + plot_ms + resize_ms + encode_ms)
+            processed += len(batch)
+
+    wall_s = time.perf_counter() - wall_start
+
+    def _stats(values):
+        arr = np.asarray(values)
+        return {
+            "p50_ms": round(float(np.percentile(arr, 50)), 3),
+            "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3),
+            "mean_ms": round(float(arr.mean()), 3),
+        }
+
+    return {
+        "images": processed,
+        "images_per_sec": round(processed / wall_s, 2) if wall_s else None,
+        "stages": {stage: _stats(values) for stage, values in timings.items()},
+        "total": _stats(per_image_total),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    parser.add_argument("--synthetic", type=int, default=16, help="Number of synthetic noise frames")
+    parser.add_argument("--synthetic-size", type=int, default=1024, help="Side of synthetic frames in px")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed single-image runs before measuring")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.synthetic, args.synthetic_size)
+    for image_bytes in inputs[:args.warmup]:
+        detector.detect_defects(image_bytes)
+
+    runs = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for batch_size in args.batch_sizes:
+            result = run_config(inputs, batch_size, args.rounds)
+            result.update({"threads": threads, "batch_size": batch_size})
+            runs.append(result)
+            print(f"threads={threads:<3} batch={batch_size:<3} {result['images_per_sec']:>8} img/s  "
+                  f"total p50/p95/p99 = {result['total']['p50_ms']}/{result['total']['p95_ms']}/{result['total']['p99_ms']} ms")
+            for stage in STAGES:
+                s = result["stages"][stage]
+                print(f"    {stage:<12} p50={s['p50_ms']:>9} p95={s['p95_ms']:>9} p99={s['p99_ms']:>9} ms")
+
+    report = {
+        "benchmark": "detector",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cpu_count": os.cpu_count(),
+        "model_path": detector.model_path,
+        "inputs": len(inputs),
+        "runs": runs,
+    }
+    if args.json_path:
+        os.makedirs(os.path.dirname(args.json_path) or ".", exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Encode time and output size of annotated images per format/quality.
+
+Usage (from backend/):
+    python -m benchmarks.encode_benchmark [--repeat 20] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from PIL import Image
+
+from config.settings import DEMO_FOLDER
+from utils.image_codec import encode_image
+
+# (format, quality, compress_level)
+CASES = [
+    ("PNG", None, 6),
+    ("PNG", None, 1),
+    ("WEBP", 80, 4),
+    ("WEBP", 80, 0),
+    ("WEBP", 60, 4),
+    ("JPEG", 90, 0),
+    ("JPEG", 80, 0),
+]
+
+
+def load_images():
+    # Same shape as the annotated output: RGB upscaled to 512x512
+    images = []
+    for path in sorted(DEMO_FOLDER.iterdir()):
+        if path.suffix.lower() not in (".png", ".jpg", ".jpeg"):
+            continue
+        img = Image.open(path).convert("RGB").resize((512, 512), resample=Image.BICUBIC)
+        images.append((path.name, img))
+    return images
+
+
+def run(repeat):
+    images = load_images()
+    results = []
+    for fmt, quality, level in CASES:
+        times_ms, sizes = [], []
+        for _, img in images:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data, content_type = encode_image(img, fmt=fmt, quality=quality or 0, compress_level=level)
+                times_ms.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(data))
+        results.append({
+            "format": fmt,
+            "quality": quality,
+            "compress_level": level,
+            "content_type": content_type,
+            "images": len(images),
+            "encode_ms_p50": round(statistics.median(times_ms), 3),
+            "encode_ms_mean": round(statistics.fmean(times_ms), 3),
+            "bytes_mean": int(statistics.fmean(sizes)),
+            "bytes_total": sum(sizes),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"{'format':<6} {'q':>4} {'lvl':>4} {'p50 ms':>9} {'mean ms':>9} {'mean bytes':>11}")
+    for r in results:
+        print(f"{r['format']:<6} {str(r['quality'] or '-'):>4} {r['compress_level']:>4} "
+              f"{r['encode_ms_p50']:>9.2f} {r['encode_ms_mean']:>9.2f} {r['bytes_mean']:>11}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
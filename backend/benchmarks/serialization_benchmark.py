@@ -0,0 +1,131 @@
+"""
+Serialization cost of the large activity responses.
+
+Builds one activity with N images (with detections) in a throwaway SQLite
+database, runs the service functions behind GET /activity/{activity_id} and
+GET /activity/v1 once, then times turning their output into response bytes:
+
+  response_model  FastAPI's own path: serialize_response() on the route's
+                  response field (validate against the model, dump to JSON)
+  fast_json       utils.fast_json.dumps (orjson, or pydantic_core fallback)
+
+and checks both produce the same JSON.
+
+Usage (from backend/):
+    python -m benchmarks.serialization_benchmark --images 10000 --rounds 5 --json data/benchmarks/serialization.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+# activity.service refuses to import without a connection string; the client it builds is never used here
+os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+
+from fastapi.routing import serialize_response
+from sqlalchemy.orm import sessionmaker
+
+from activity import service
+from activity.controller import router
+from db import Activity, ActivityImage, Base, make_engine
+from utils import fast_json
+
+
+def seed(db, images, seed=0):
+    rng = np.random.default_rng(seed)
+    activity_id = str(uuid.uuid4())
+    db.add(Activity(id=activity_id, name="serialization", status="completed", from_value="A", to_value="B"))
+    for i in range(images):
+        detections = [
+            {"id": k + 1, "class": "patches" if k % 2 else "scratches", "confidence": round(float(c), 2),
+             "bbox": {"x1": 10, "y1": 20, "x2": 110, "y2": 120}}
+            for k, c in enumerate(rng.random(int(rng.integers(0, 4))))
+        ]
+        db.add(ActivityImage(
+            activity_id=activity_id,
+            filename=f"image_{i:06d}.png",
+            status="defects_detected" if detections else "no_defects",
+            detections=detections,
+            original_blob_url=f"https://example.blob.core.windows.net/images/original/image_{i:06d}.png",
+            annotated_blob_url=f"https://example.blob.core.windows.net/images/annotated/image_{i:06d}.png" if detections else None,
+        ))
+    db.commit()
+    return activity_id
+
+
+def _route_field(path, method="GET"):
+    for route in router.routes:
+        if route.path == path and method in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+def _time(fn, rounds):
+    samples = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    arr = np.asarray(samples)
+    return result, {"p50_ms": round(float(np.percentile(arr, 50)), 2), "min_ms": round(float(arr.min()), 2)}
+
+
+def bench(name, content, field, rounds):
+    def default_path():
+        return asyncio.run(serialize_response(field=field, response_content=content, is_coroutine=False, dump_json=True))
+
+    baseline, default_stats = _time(default_path, rounds)
+    fast, fast_stats = _time(lambda: fast_json.dumps(content), rounds)
+    same = json.loads(baseline) == json.loads(fast)
+    return {
+        "endpoint": name,
+        "bytes": len(fast),
+        "response_model": default_stats,
+        "fast_json": fast_stats,
+        "speedup": round(default_stats["p50_ms"] / fast_stats["p50_ms"], 1) if fast_stats["p50_ms"] else None,
+        "identical_json": same,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{tmp}/serialization.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            activity_id = seed(db, args.images)
+            detail = service.get_activity_demo(db, activity_id)
+            listing = service.list_activities(db)
+        finally:
+            db.close()
+            engine.dispose()
+
+    reports = [
+        bench("GET /activity/{activity_id}", detail, _route_field("/activity/{activity_id}"), args.rounds),
+        bench("GET /activity/v1", listing, _route_field("/activity/v1"), args.rounds),
+    ]
+    encoder = "orjson" if fast_json.orjson is not None else "pydantic_core"
+    for r in reports:
+        print(f"{r['endpoint']:<30} {r['bytes'] / 1e6:6.2f} MB  response_model p50={r['response_model']['p50_ms']:>8} ms  "
+              f"{encoder} p50={r['fast_json']['p50_ms']:>7} ms  x{r['speedup']}  identical={r['identical_json']}")
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(args.json_path) or ".", exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump({"images": args.images, "encoder": encoder, "results": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
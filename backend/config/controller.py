@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from config.schema import Thresholds, ThresholdsResponse, ConfigExample
+from fastapi import APIRouter, HTTPException, Query
+from config.schema import Thresholds, ThresholdsResponse, ConfigExample, ProfileStatusResponse
 from config.service import get_thresholds, set_thresholds, clear_thresholds, _load_config_file, _save_config_file
+from config.settings import PROFILE_INTERVAL_MS
 from utils.logger import log_audit
+from utils.profiler import start_profile, profile_status
 
 LOG_PATH = "data/logs/audit.log"
 
@@ -79,3 +81,27 @@ def update_full_config(payload: ConfigExample):
     except Exception as e:
         log_audit(f"Unexpected error updating full config: {str(e)}", LOG_PATH)
         raise HTTPException(status_code=500, detail=f"Unexpected error updating full config: {str(e)}")
+
+@router.post("/admin/profile", response_model=ProfileStatusResponse)
+def start_profiling(
+    seconds: float = Query(10.0, gt=0.0, le=300.0, description="How long to sample this worker"),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1.0, le=1000.0, description="Sampling interval"),
+):
+    """
+    Sample every thread of the worker that handles this request for `seconds`
+    and write a collapsed-stack (flamegraph) file under data/profiles.
+    To profile a single request instead, send it with X-Profile-Request: <PROFILE_REQUEST_SECRET>.
+    """
+    try:
+        start_profile(seconds, interval_ms / 1000)
+        log_audit(f"Profiling started via Admin API for {seconds}s", LOG_PATH)
+        return ProfileStatusResponse(**profile_status())
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log_audit(f"Unexpected error starting profiler: {str(e)}", LOG_PATH)
+        raise HTTPException(status_code=500, detail=f"Unexpected error starting profiler: {str(e)}")
+
+@router.get("/admin/profile", response_model=ProfileStatusResponse)
+def read_profiling_status():
+    return ProfileStatusResponse(**profile_status())
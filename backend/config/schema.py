@@ -39,3 +39,10 @@ class ConfigExample(BaseModel):
                 "IOT_API_KEY": "dummy_key"
             }
         }
+
+class ProfileStatusResponse(BaseModel):
+    running: bool
+    output: Optional[str] = None     # collapsed-stack file under data/profiles
+    seconds: Optional[float] = None
+    samples: int
+    pid: int
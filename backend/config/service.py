@@ -1,8 +1,12 @@
+import hashlib
 import json
 import os
+import tempfile
+import threading
 from fastapi import HTTPException
-from typing import Tuple
+from typing import Callable, Tuple
 from config.schema import Thresholds
+from config.settings import CONFIG_WATCH_INTERVAL
 from utils.logger import log_audit
 from pathlib import Path
 
@@ -12,35 +16,136 @@ LOG_PATH = "data/logs/audit.log"
 DEFAULT_LOW = 0.3
 DEFAULT_HIGH = 0.7
 
-def _load_config_file() -> dict:
-    if not os.path.exists(CONFIG_FILE):
-        return {
+# Process-wide cache of config.json, keyed by the file's stat signature
+_cache_lock = threading.Lock()
+_cache = {"loaded": False, "signature": None, "data": None}
+
+# Consumers notified with the new config dict whenever it changes
+_subscribers: list = []
+
+# Background poller that picks up writes from other worker processes
+_watcher = {"thread": None, "stop": threading.Event()}
+
+def _file_signature():
+    """(mtime_ns, size, inode) of config.json, or None when it doesn't exist."""
+    try:
+        st = os.stat(CONFIG_FILE)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def invalidate_config_cache():
+    with _cache_lock:
+        _cache.update(loaded=False, signature=None, data=None)
+
+def _read_config(signature) -> dict:
+    if signature is None:
+        data = {
             "low": DEFAULT_LOW,
             "high": DEFAULT_HIGH
         }
-    try:
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        log_audit(f"Error loading config.json: {str(e)}", LOG_PATH)
-        raise HTTPException(status_code=500, detail="Failed to load config.json")
+    else:
+        try:
+            with open(CONFIG_FILE, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            log_audit(f"Error loading config.json: {str(e)}", LOG_PATH)
+            raise HTTPException(status_code=500, detail="Failed to load config.json")
+        log_audit(f"config.json (re)loaded: low={data.get('low')}, high={data.get('high')}", LOG_PATH)
+    return data
+
+def _refresh() -> bool:
+    """Reload config.json if its signature changed and notify subscribers. Returns True on change."""
+    signature = _file_signature()
+    with _cache_lock:
+        if _cache["loaded"] and _cache["signature"] == signature:
+            return False
+
+    data = _read_config(signature)
+    with _cache_lock:
+        changed = not _cache["loaded"] or _cache["data"] != data
+        _cache.update(loaded=True, signature=signature, data=data)
+
+    if changed:
+        _notify(data)
+    return True
+
+def _notify(data: dict):
+    for callback in list(_subscribers):
+        try:
+            callback(dict(data))
+        except Exception as e:
+            log_audit(f"Config subscriber {getattr(callback, '__name__', callback)} failed: {str(e)}", LOG_PATH)
+
+def subscribe(callback: Callable[[dict], None]):
+    """Register callback(config_dict); it is called now and on every subsequent change."""
+    data = _load_config_file()
+    _subscribers.append(callback)
+    callback(data)
+
+def _load_config_file() -> dict:
+    # While the watcher runs it keeps the cache fresh, so reads stay in memory
+    if _watcher["thread"] is None or not _cache["loaded"]:
+        _refresh()
+    with _cache_lock:
+        return dict(_cache["data"])   # copy: callers update and save it
+
+def _watch_loop(interval: float):
+    while not _watcher["stop"].wait(interval):
+        try:
+            _refresh()
+        except Exception as e:
+            log_audit(f"Config watcher failed to reload config.json: {str(e)}", LOG_PATH)
+
+def start_config_watcher(interval: float = CONFIG_WATCH_INTERVAL):
+    if _watcher["thread"] is not None:
+        return
+    _refresh()
+    _watcher["stop"].clear()
+    thread = threading.Thread(target=_watch_loop, args=(interval,), name="config-watcher", daemon=True)
+    _watcher["thread"] = thread
+    thread.start()
+
+def stop_config_watcher():
+    thread = _watcher["thread"]
+    if thread is None:
+        return
+    _watcher["stop"].set()
+    thread.join(timeout=5)
+    _watcher["thread"] = None
 
 def _save_config_file(data: dict):
+    # Write to a temp file in the same directory and rename over config.json,
+    # so readers in any process see either the old or the new file, never a partial one
+    tmp_path = None
     try:
         os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-        with open(CONFIG_FILE, "w") as f:
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(CONFIG_FILE), prefix=".config.", suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
             json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, CONFIG_FILE)
     except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        invalidate_config_cache()
         log_audit(f"Error saving config.json: {str(e)}", LOG_PATH)
         raise HTTPException(status_code=500, detail="Failed to save config.json")
+    _refresh()   # push the new values to subscribers in this process
+
+def config_version() -> str:
+    """Short hash of the current config; changes whenever thresholds do."""
+    cfg = _load_config_file()
+    return hashlib.sha1(json.dumps(cfg, sort_keys=True).encode()).hexdigest()[:12]
 
 def get_thresholds() -> Tuple[float, float, str]:
     try:
         cfg = _load_config_file()
         low = cfg.get("low", DEFAULT_LOW)
         high = cfg.get("high", DEFAULT_HIGH)
-        source = "user" if os.path.exists(CONFIG_FILE) else "default"
-        log_audit(f"Thresholds retrieved: low={low}, high={high}, source={source}", LOG_PATH)
+        with _cache_lock:
+            source = "user" if _cache["signature"] is not None else "default"
         return low, high, source
     except HTTPException as e:
         raise e
@@ -68,5 +173,7 @@ def clear_thresholds():
             os.remove(CONFIG_FILE)
         log_audit("Thresholds reset to defaults", LOG_PATH)
     except Exception as e:
+        invalidate_config_cache()
         log_audit(f"Error resetting thresholds: {str(e)}", LOG_PATH)
         raise HTTPException(status_code=500, detail=f"Failed to reset thresholds: {str(e)}")
+    _refresh()
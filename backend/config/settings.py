@@ -1,4 +1,93 @@
+import os
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DEMO_FOLDER = PROJECT_ROOT / "data/demo_images"
+
+# Annotated image rendering: "eager" renders during sync, "lazy" renders on first request
+ANNOTATION_MODE = os.getenv("ANNOTATION_MODE", "eager").lower()
+
+# Annotated image encoding: PNG | WEBP | JPEG
+ANNOTATED_FORMAT = os.getenv("ANNOTATED_FORMAT", "PNG").upper()
+ANNOTATED_QUALITY = int(os.getenv("ANNOTATED_QUALITY", "80"))              # WEBP/JPEG, 1-100
+ANNOTATED_COMPRESS_LEVEL = int(os.getenv("ANNOTATED_COMPRESS_LEVEL", "6"))  # PNG zlib level 0-9, WEBP method 0-6
+
+# Gallery thumbnails uploaded under thumbs/ during sync
+THUMBNAILS_ENABLED = os.getenv("THUMBNAILS_ENABLED", "true").lower() == "true"
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "160"))                    # longest side in px
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "JPEG").upper()
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+
+IMAGE_FORMATS = ("PNG", "WEBP", "JPEG")
+for _name, _value in (("ANNOTATED_FORMAT", ANNOTATED_FORMAT), ("THUMBNAIL_FORMAT", THUMBNAIL_FORMAT)):
+    if _value not in IMAGE_FORMATS:
+        raise RuntimeError(f"{_name}={_value!r} is not supported; use one of {', '.join(IMAGE_FORMATS)}")
+
+# How often (seconds) each worker polls config.json for changes made by other workers
+CONFIG_WATCH_INTERVAL = float(os.getenv("CONFIG_WATCH_INTERVAL", "1.0"))
+
+# Audit log writer (utils/logger.py)
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))            # lines buffered before dropping
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))     # seconds between writes when idle
+AUDIT_MAX_BYTES = int(os.getenv("AUDIT_MAX_BYTES", str(10 * 1024 * 1024)))  # rotate at this size, 0 disables
+AUDIT_ROTATE_SECONDS = int(os.getenv("AUDIT_ROTATE_SECONDS", "0"))         # rotate after this age, 0 disables
+AUDIT_BACKUP_COUNT = int(os.getenv("AUDIT_BACKUP_COUNT", "5"))
+
+# Timing spans, /metrics and Server-Timing headers (utils/metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Sampling profiler output (utils/profiler.py)
+PROFILE_DIR = str(PROJECT_ROOT / "data/profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_REQUEST_SECRET = os.getenv("PROFILE_REQUEST_SECRET", "")           # X-Profile-Request value; unset disables it
+
+# Analytics response cache (analytics/cache.py); TTL 0 disables it
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "5"))        # seconds
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "128"))      # entries, LRU beyond that
+ANALYTICS_INCREMENTAL = os.getenv("ANALYTICS_INCREMENTAL", "true").lower() == "true"  # watermark-based summary (analytics/incremental.py)
+ANALYTICS_CONSISTENCY_CHECK_SECONDS = float(os.getenv("ANALYTICS_CONSISTENCY_CHECK_SECONDS", "300"))  # full recount of the aggregate at most this often
+
+# Database engine (db.py)
+# SQLite: applied as PRAGMAs on every new connection; empty string skips a pragma
+DB_SQLITE_JOURNAL_MODE = os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL")          # readers don't wait for writers
+DB_SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL")         # safe with WAL, fsync per checkpoint
+DB_SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DB_SQLITE_MMAP_SIZE = int(os.getenv("DB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes, 0 disables
+# Server databases (Postgres): connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))                  # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))                  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Fast JSON path for large activity responses (utils/fast_json.py): encode with
+# orjson and skip response_model re-validation of service output
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+# Response compression (main.py): gzip | br | off. "br" needs the optional
+# brotli-asgi package and falls back to gzip for clients without br support
+COMPRESSION = os.getenv("COMPRESSION", "gzip").lower()
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))     # bytes; smaller bodies go out as is
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))                            # 1-9
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))                    # 0-11
+
+# Cache-Control for /demo_images (utils/static_files.py); content-hashed names (name.<16+ hex>.ext) are cached for a year
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "300"))                  # seconds, other files
+
+# Columnar snapshots for offline analysis (analytics/snapshot.py)
+EXPORT_DIR = str(PROJECT_ROOT / "data/exports")
+
+# Sync leases: workers lease chunks of rows; a row left in "processing" past its lease (worker died) is claimed again
+SYNC_LEASE_SECONDS = int(os.getenv("SYNC_LEASE_SECONDS", "600"))
+SYNC_CLAIM_SIZE = int(os.getenv("SYNC_CLAIM_SIZE", "16"))                  # rows a sync worker leases at a time
+# A failed image goes back to "pending" until it has failed SYNC_MAX_ATTEMPTS times, then stays "error"
+SYNC_MAX_ATTEMPTS = int(os.getenv("SYNC_MAX_ATTEMPTS", "3"))
+SYNC_RETRY_BACKOFF_SECONDS = int(os.getenv("SYNC_RETRY_BACKOFF_SECONDS", "60"))  # doubles with every attempt
+
+# Fair scheduler in front of the detector (models/scheduler.py): threads per worker process running inference
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_LATENCY_TARGET_MS = float(os.getenv("INFERENCE_LATENCY_TARGET_MS", "500"))  # per batch; batch size adapts to it
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))   # longest wait to fill a batch
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "512"))        # queued images before new syncs get 429
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "120"))  # demo syncs give up on an image after this
@@ -1,16 +1,73 @@
 import os
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, ForeignKey, JSON, func
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import create_engine, event, inspect, insert, update, Column, String, DateTime, Integer, ForeignKey, JSON, Index, func
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
 from datetime import datetime, timezone
+from utils.metrics import span
+from config.settings import (
+    DB_SQLITE_JOURNAL_MODE,
+    DB_SQLITE_SYNCHRONOUS,
+    DB_SQLITE_BUSY_TIMEOUT_MS,
+    DB_SQLITE_MMAP_SIZE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+)
 
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./defects.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def sqlite_pragmas() -> dict:
+    pragmas = {
+        "journal_mode": DB_SQLITE_JOURNAL_MODE,
+        "synchronous": DB_SQLITE_SYNCHRONOUS,
+        "busy_timeout": DB_SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": DB_SQLITE_MMAP_SIZE,
+    }
+    return {name: value for name, value in pragmas.items() if value != ""}
+
+def make_engine(database_url: str, pragmas: dict = None, **overrides):
+    """
+    Engine for `database_url` configured from settings. SQLite gets `pragmas`
+    (default: sqlite_pragmas()) on every new connection; other databases get
+    the pool settings. `overrides` are passed through to create_engine.
+    """
+    if database_url.startswith("sqlite"):
+        options = {"connect_args": {"check_same_thread": False}}
+    else:
+        options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+    options.update(overrides)
+    new_engine = create_engine(database_url, **options)
+
+    if new_engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(new_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return new_engine
+
+engine = make_engine(DATABASE_URL)
+
+class InstrumentedSession(Session):
+    def commit(self):
+        with span("db_commit"):
+            super().commit()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=InstrumentedSession)
 Base = declarative_base()
 
 # Dependency Injection
@@ -21,6 +78,9 @@ def get_db():
     finally:
         db.close()
 
+# Share of the detector an activity gets while syncing (models/scheduler.py); higher = bigger share
+DEFAULT_PRIORITY = 1
+
 class Activity(Base):
     __tablename__ = "activities"
 
@@ -31,6 +91,10 @@ class Activity(Base):
 
     from_value = Column(String, nullable=True)
     to_value = Column(String, nullable=True)
+    priority = Column(Integer, nullable=False, default=DEFAULT_PRIORITY, server_default=str(DEFAULT_PRIORITY))
+
+    # Bumped whenever the activity or any of its images change (ETags)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     images = relationship("ActivityImage", back_populates="activity", cascade="all, delete-orphan")
 
@@ -42,6 +106,10 @@ class ActivityImage(Base):
     filename = Column(String, nullable=False)  # e.g., "patches.png"
     status = Column(String, default="pending")  # pending | processing | no_defects | defects_detected | error
     detections = Column(JSON)
+    lease_owner = Column(String)                         # sync worker holding the row while "processing"
+    lease_expires_at = Column(DateTime(timezone=True))   # past it the row is up for grabs
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")   # failed sync attempts
+    retry_at = Column(DateTime(timezone=True))           # a failed "pending" row waits until then
 
     # Defect counts
     high_defects = Column(Integer, default=0)
@@ -51,11 +119,105 @@ class ActivityImage(Base):
     # Blob URLs
     original_blob_url = Column(String)     # https://.../images/original/<filename>
     annotated_blob_url = Column(String)    # https://.../images/annotated/<filename>
+    original_thumb_url = Column(String)    # https://.../images/thumbs/original/<filename>
+    annotated_thumb_url = Column(String)   # https://.../images/thumbs/annotated/<filename>
 
     # Add created_at for reliable sorting
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     activity = relationship("Activity", back_populates="images")
 
+    __table_args__ = (
+        # Date-range analytics scoped to a few activities
+        Index("ix_activity_images_activity_id_created_at", "activity_id", "created_at"),
+        # One row per blob, even with several sync workers registering at once
+        Index("uq_activity_images_activity_id_filename", "activity_id", "filename", unique=True),
+    )
+
 #def init_db():
     #Base.metadata.create_all(bind=engine)
+
+class DataRevision(Base):
+    """Single row (id=1) counting writes to activities/images; versions the analytics ETags."""
+    __tablename__ = "data_revision"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+@event.listens_for(DataRevision.__table__, "after_create")
+def _seed_data_revision(target, connection, **kw):
+    # create_all databases get their row up front, like the migration does; bumps only ever UPDATE it
+    connection.execute(insert(target).values(id=1, value=0))
+
+# ---------------- Revisions ----------------
+
+def _bump_revisions(connection, activity_ids):
+    if activity_ids:
+        activities = Activity.__table__
+        connection.execute(
+            update(activities)
+            .where(activities.c.id.in_(activity_ids))
+            .values(revision=activities.c.revision + 1)
+        )
+    revisions = DataRevision.__table__
+    connection.execute(update(revisions).where(revisions.c.id == 1).values(value=revisions.c.value + 1))
+
+# Leases are bookkeeping between sync workers, never part of a response
+_UNVERSIONED_IMAGE_COLUMNS = {"lease_owner", "lease_expires_at", "attempts", "retry_at"}
+_FINAL_IMAGE_STATUSES = ("no_defects", "defects_detected", "error")
+
+def _image_changed(image: ActivityImage) -> bool:
+    """Whether a dirty image changes what the activity/analytics endpoints return."""
+    state = inspect(image)
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    if "status" in changed:
+        return True
+    # A row still being processed (URLs, checkpointed detections, thumbnails) becomes
+    # visible with the status change that finishes it; that one bump covers them
+    if image.status not in _FINAL_IMAGE_STATUSES:
+        return False
+    return bool(changed - _UNVERSIONED_IMAGE_COLUMNS)
+
+@event.listens_for(Session, "before_flush")
+def _track_revisions(session, flush_context, instances):
+    changed = False
+    activity_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, ActivityImage):
+            if obj in session.dirty and not _image_changed(obj):
+                continue
+            changed = True
+            activity_id = obj.activity_id or (obj.activity.id if obj.activity is not None else None)
+            if activity_id:
+                activity_ids.add(activity_id)
+        elif isinstance(obj, Activity):
+            changed = True
+            activity_ids.add(obj.id)
+    if changed:
+        # Core statements on the flush's connection: no autoflush, same transaction
+        _bump_revisions(session.connection(), activity_ids)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_revisions(orm_execute_state):
+    # query(...).delete() / bulk update() skip flush events. Deleted activities
+    # need no revision; bulk updates that change what an activity endpoint
+    # returns should call bump_activity_revision() themselves. Lease-only
+    # updates (claims, heartbeats) opt out with execution_options(skip_revision=True).
+    if not (orm_execute_state.is_delete or orm_execute_state.is_update):
+        return
+    if orm_execute_state.execution_options.get("skip_revision"):
+        return
+    if any(mapper.class_ in (Activity, ActivityImage) for mapper in orm_execute_state.all_mappers):
+        _bump_revisions(orm_execute_state.session.connection(), ())
+
+def bump_activity_revision(db: Session, activity_id: str):
+    _bump_revisions(db.connection(), {activity_id})
+
+def get_activity_revision(db: Session, activity_id: str):
+    """Current revision of the activity, or None when it doesn't exist."""
+    return db.query(Activity.revision).filter(Activity.id == activity_id).scalar()
+
+def get_data_revision(db: Session) -> int:
+    return db.query(DataRevision.value).filter(DataRevision.id == 1).scalar() or 0
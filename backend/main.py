@@ -1,20 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.middleware.gzip import GZipMiddleware
 #from db import init_db
 from activity.controller import router as activity_router
 from analytics.controller import router as analytics_router
 from config.controller import router as config_router
 from dotenv import load_dotenv
 from config.settings import DEMO_FOLDER
-from fastapi.staticfiles import StaticFiles
+from config.service import start_config_watcher, stop_config_watcher
+from utils.logger import shutdown_audit_logger
+from utils.metrics import TimedJSONResponse, begin_request, end_request, render_metrics
+from utils.profiler import (
+    PROFILE_HEADER,
+    begin_request_profile,
+    end_request_profile,
+    request_profile_allowed,
+    write_request_profile,
+)
+from config.settings import METRICS_ENABLED, PROFILE_INTERVAL_MS
+from config.settings import COMPRESSION, COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+from starlette.concurrency import run_in_threadpool
+from utils.static_files import CachedStaticFiles
+from utils.logger import log_audit
 import os
+import time
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Create FastAPI app
-app = FastAPI(title="Surface Defect Detection API", version="1.0.0")
-app.mount("/demo_images", StaticFiles(directory=str(DEMO_FOLDER)), name="demo_images")
+app = FastAPI(title="Surface Defect Detection API", version="1.0.0", default_response_class=TimedJSONResponse)
+app.mount("/demo_images", CachedStaticFiles(directory=str(DEMO_FOLDER)), name="demo_images")
 # Initialize database tables
 #init_db()
 
@@ -27,11 +44,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/text responses above COMPRESSION_MIN_SIZE (images are already compressed and skipped)
+if COMPRESSION == "br":
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+    except ImportError:
+        log_audit("COMPRESSION=br but brotli-asgi is not installed; using gzip", "data/logs/audit.log")
+        COMPRESSION = "gzip"
+if COMPRESSION == "gzip":
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# Per-request timing: Server-Timing header + request duration histogram
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def timing_middleware(request: Request, call_next):
+        token = begin_request()
+        # X-Profile-Request: <PROFILE_REQUEST_SECRET> samples only the threads running this request's spans
+        profile = None
+        if request_profile_allowed(request.headers.get(PROFILE_HEADER)):
+            profile = begin_request_profile(PROFILE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await call_next(request)
+        finally:
+            # Also when the route raised: the 500 is recorded and the ContextVar token reset
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            label = f"{request.method}{path}".replace("/", "_").replace("{", "").replace("}", "")
+            status = response.status_code if response is not None else 500
+            server_timing = end_request(token, request.method, path, status, time.perf_counter() - start)
+            if profile is not None:
+                # The ContextVar token belongs to this context; only the blocking stop/write goes to a thread
+                end_request_profile(*profile)
+                output = await run_in_threadpool(write_request_profile, profile[0], label)
+        response.headers["Server-Timing"] = server_timing
+        response.headers["Timing-Allow-Origin"] = "*"
+        if profile is not None:
+            response.headers["X-Profile-Output"] = output
+        return response
+
 # Register routers
 app.include_router(activity_router)
 app.include_router(analytics_router)
 app.include_router(config_router)
 
+# Keep config.json changes from other workers flowing into this one
+@app.on_event("startup")
+def startup():
+    start_config_watcher()
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_config_watcher()
+    shutdown_audit_logger()   # flush queued audit lines
+
+# Prometheus scrape endpoint (per worker process)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/")
 def root():
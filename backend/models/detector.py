@@ -1,35 +1,42 @@
 from ultralytics import YOLO
+from ultralytics.utils.plotting import Annotator, colors
 from PIL import Image
 import numpy as np
 from io import BytesIO
 import os
 from utils.config_loader import load_config
+from utils.image_codec import encode_image, CONTENT_TYPES
+from config.settings import ANNOTATED_FORMAT
+from utils.metrics import span
 
 # Load config and model once
 config = load_config()
 model_path = os.path.join("models", "weights", "best.pt")
 model = YOLO(model_path)
 
-def detect_defects(image_bytes):
-    # Load and preprocess image
+# Reverse lookup used when re-drawing stored detections
+class_ids = {name: cls_id for cls_id, name in model.names.items()}
+
+ANNOTATED_CONTENT_TYPE = CONTENT_TYPES[ANNOTATED_FORMAT]
+
+
+@span("preprocess")
+def preprocess(image_bytes):
+    # Grayscale 256x256, replicated to 3 channels for the model
     image = Image.open(BytesIO(image_bytes)).convert("L").resize(tuple([256,256]))
     image = Image.merge("RGB", (image, image, image))
-    image_array = np.array(image)
+    return np.array(image)
 
-    # Run prediction
-    results = model.predict(image_array, conf=0.2)
-    result = results[0]
 
-    # Annotated image
-    result_img = result.plot(line_width=2, font_size=1, font="Arial")
-    result_pil = Image.fromarray(result_img, mode="RGB")
-    result_pil = result_pil.resize((512, 512), resample=Image.BICUBIC)
+# Individual stages are exposed so benchmarks/detector_benchmark.py can time them separately
+
+@span("predict")
+def predict(image_arrays):
+    """Run the model on a list of preprocessed arrays; one result per array."""
+    return model.predict(image_arrays, conf=0.2)
 
-    # Save annotated image to raw bytes (PNG format)
-    buf = BytesIO()
-    result_pil.save(buf, format="PNG")
-    result_bytes = buf.getvalue()   # 👈 raw binary instead of base64
 
+def postprocess(result):
     # Detection summary
     summary = []
     for i, box in enumerate(result.boxes):
@@ -43,8 +50,68 @@ def detect_defects(image_bytes):
             "confidence": round(conf, 2),
             "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
         })
+    return summary
+
+
+@span("plot")
+def plot(result):
+    return result.plot(line_width=2, font_size=1, font="Arial")
+
+
+def upscale(result_img):
+    result_pil = Image.fromarray(result_img, mode="RGB")
+    return result_pil.resize((512, 512), resample=Image.BICUBIC)
+
+
+def encode(result_pil):
+    # Save annotated image to raw bytes (format from ANNOTATED_FORMAT)
+    result_bytes, _ = encode_image(result_pil)
+    return result_bytes
+
+
+@span("encode")
+def _encode_annotated(result_img):
+    return encode(upscale(result_img))
+
+
+def detect_defects_batch(images_bytes, render=True):
+    """Batched detect_defects(): one model call for all images, results in input order."""
+    results = predict([preprocess(image_bytes) for image_bytes in images_bytes])
+
+    outputs = []
+    for result in results:
+        # Annotated image
+        result_bytes = _encode_annotated(plot(result)) if render else b""   # 👈 raw binary instead of base64
+        outputs.append({
+            "result_image_bytes": result_bytes,  # 👈 now returns bytes
+            "content_type": ANNOTATED_CONTENT_TYPE,
+            "detections": postprocess(result)
+        })
+    return outputs
+
+
+def detect_defects(image_bytes, render=True):
+    """
+    Run detection on raw image bytes.
+    With render=False the annotated image is skipped and result_image_bytes is empty;
+    use render_annotated() later to produce it from the stored detections.
+    """
+    return detect_defects_batch([image_bytes], render=render)[0]
+
 
-    return {
-        "result_image_bytes": result_bytes,  # 👈 now returns bytes
-        "detections": summary
-    }
+def render_annotated(image_bytes, detections):
+    """
+    Draw stored detections on the original image without re-running the model.
+    Output matches the annotated image produced by detect_defects().
+    """
+    annotator = Annotator(preprocess(image_bytes), line_width=2, font_size=1, font="Arial")
+    for d in detections:
+        bbox = d["bbox"]
+        cls_name = d.get("class", "")
+        label = f"{cls_name} {float(d.get('confidence', 0.0)):.2f}"
+        annotator.box_label(
+            [bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]],
+            label,
+            color=colors(class_ids.get(cls_name, 0), True),
+        )
+    return _encode_annotated(annotator.result())
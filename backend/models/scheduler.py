@@ -0,0 +1,260 @@
+"""
+Weighted fair queuing and adaptive batching in front of the detector.
+
+Syncs submit images tagged with their activity and its priority.
+INFERENCE_WORKERS dispatcher threads take the queued images with the smallest
+virtual finish time (self-clocked fair queuing) and run them through
+detect_defects_batch() in one model call. Every activity with queued work
+gets a share of the detector proportional to its priority, no matter how
+many images it has queued, so a small high-priority inspection isn't stuck
+behind a 50k-image backlog.
+
+    future = inference_scheduler.submit(activity_id, priority, image_bytes, render=True)
+    result = future.result()        # same dict as detect_defects()
+
+Batch size and flush timeout are tuned on the fly (AIMD, see BatchTuner)
+against INFERENCE_LATENCY_TARGET_MS: big batches while there is a backlog
+and headroom, single images dispatched straight away when the queue is
+short. Past INFERENCE_MAX_QUEUE queued images overloaded() turns true so
+callers can answer 429, and submit() blocks until there is room, calling
+on_wait (e.g. a lease heartbeat) every second meanwhile.
+
+Queues are per worker process; stats() and depths() report this process only.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from config.settings import (
+    INFERENCE_WORKERS,
+    INFERENCE_LATENCY_TARGET_MS,
+    INFERENCE_MAX_BATCH,
+    INFERENCE_MAX_WAIT_MS,
+    INFERENCE_MAX_QUEUE,
+)
+
+_FULL_QUEUE_POLL_S = 1.0    # how often a blocked submit() calls on_wait
+
+
+class BatchTuner:
+    """
+    Additive-increase / multiplicative-decrease batch sizing. A batch slower
+    than the target halves the size; a fast batch with more work waiting grows
+    it by one. The flush timeout (how long a worker waits to fill a batch) is
+    the headroom a full batch would leave under the target, capped at max_wait.
+    """
+
+    def __init__(self, target_s: float, max_batch: int, max_wait_s: float):
+        self.target_s = target_s
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max_wait_s
+        self.batch_size = 1
+        self.flush_timeout = 0.0
+        self.batch_latency = None      # EWMA, seconds per batch
+        self.image_latency = None      # EWMA, seconds per image
+
+    def observe(self, size: int, seconds: float, backlog: int):
+        per_image = seconds / size
+        if self.batch_latency is None:
+            self.batch_latency, self.image_latency = seconds, per_image
+        else:
+            self.batch_latency += 0.2 * (seconds - self.batch_latency)
+            self.image_latency += 0.2 * (per_image - self.image_latency)
+
+        if seconds > self.target_s:
+            self.batch_size = max(1, self.batch_size // 2)
+        elif backlog >= self.batch_size and size >= self.batch_size and seconds < 0.8 * self.target_s:
+            self.batch_size = min(self.max_batch, self.batch_size + 1)
+
+        headroom = self.target_s - self.image_latency * self.batch_size
+        self.flush_timeout = 0.0 if self.batch_size == 1 else min(self.max_wait_s, max(0.0, headroom))
+
+
+class _Flow:
+    __slots__ = ("weight", "last_finish", "queued", "running", "completed")
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.last_finish = 0.0
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+
+
+class FairScheduler:
+    def __init__(self, workers: int = 1, batch_fn: Optional[Callable] = None, max_queue: int = INFERENCE_MAX_QUEUE,
+                 tuner: Optional[BatchTuner] = None):
+        self.workers = max(1, workers)
+        self.batch_fn = batch_fn           # batch_fn(list of image bytes, render) -> results in input order
+        self.max_queue = max_queue
+        self.tuner = tuner or BatchTuner(INFERENCE_LATENCY_TARGET_MS / 1000, INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS / 1000)
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)    # signalled on submit
+        self._room = threading.Condition(self._lock)    # signalled when images leave the queue
+        self._heap = []                 # (finish tag, seq, flow key, future, image bytes, render)
+        self._flows: Dict[str, _Flow] = {}
+        self._virtual_time = 0.0        # finish tag of the image dispatched last
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+
+    def _ensure_started(self):
+        # Also restarts in a forked worker, where the parent's threads don't exist
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._heap, self._flows = [], {}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"inference-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------------- Admission ----------------
+
+    def overloaded(self) -> bool:
+        return len(self._heap) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained, for a Retry-After header."""
+        per_image = self.tuner.image_latency or self.tuner.target_s
+        return max(1, math.ceil(len(self._heap) * per_image / self.workers))
+
+    def submit(self, key: str, weight: float, image_bytes: bytes, render: bool = True,
+               on_wait: Optional[Callable[[], None]] = None, timeout: Optional[float] = None) -> Future:
+        """
+        Queue one image under flow `key` (higher weight = bigger share). While
+        the queue is full it blocks, calling on_wait() outside the lock every
+        _FULL_QUEUE_POLL_S, and raises TimeoutError after `timeout` seconds.
+        """
+        future = Future()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._ensure_started()
+                if len(self._heap) >= self.max_queue:
+                    self._room.wait(_FULL_QUEUE_POLL_S)
+                if len(self._heap) < self.max_queue:
+                    self._push(key, weight, future, image_bytes, render)
+                    return future
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Detector queue still full after {timeout}s")
+            if on_wait is not None:
+                on_wait()
+
+    def _push(self, key: str, weight: float, future: Future, image_bytes: bytes, render: bool):
+        # Caller holds the lock
+        self._prune_idle()
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._flows[key] = _Flow(weight)
+        flow.weight = max(weight, 1e-6)
+        # An idle flow restarts at the current virtual time instead of cashing in old credit
+        start = max(self._virtual_time, flow.last_finish)
+        flow.last_finish = start + 1.0 / flow.weight
+        flow.queued += 1
+        heapq.heappush(self._heap, (flow.last_finish, next(self._seq), key, future, image_bytes, render))
+        self._work.notify()
+
+    def _prune_idle(self):
+        # Idle flows are dropped once the virtual clock has passed their last tag, when
+        # restarting at the current virtual time gives them nothing extra (caller holds the lock)
+        for key in [key for key, flow in self._flows.items()
+                    if not flow.queued and not flow.running and flow.last_finish <= self._virtual_time]:
+            del self._flows[key]
+
+    # ---------------- Dispatch ----------------
+
+    def _next_batch(self):
+        with self._lock:
+            while True:
+                while not self._heap:
+                    self._work.wait()
+                # Give a short queue a moment to fill the batch
+                deadline = time.monotonic() + self.tuner.flush_timeout
+                while len(self._heap) < self.tuner.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._work.wait(remaining)
+                if self._heap:   # another worker may have taken everything meanwhile
+                    break
+
+            batch = []
+            render = self._heap[0][5]
+            while self._heap and len(batch) < self.tuner.batch_size and self._heap[0][5] == render:
+                finish, _, key, future, image_bytes, _ = heapq.heappop(self._heap)
+                self._virtual_time = finish
+                flow = self._flows[key]
+                flow.queued -= 1
+                flow.running += 1
+                batch.append((key, future, image_bytes))
+            self._room.notify_all()
+            return batch, render
+
+    def _run(self):
+        while True:
+            batch, render = self._next_batch()
+            live = [(key, future, image_bytes) for key, future, image_bytes in batch if future.set_running_or_notify_cancel()]
+
+            started = time.perf_counter()
+            if live:
+                try:
+                    results = list(self._batch_fn()([image_bytes for _, _, image_bytes in live], render))
+                    if len(results) != len(live):
+                        # zip() would leave the unmatched futures waiting forever
+                        raise RuntimeError(f"Detector returned {len(results)} results for a batch of {len(live)} images")
+                    for (_, future, _), result in zip(live, results):
+                        future.set_result(result)
+                except BaseException as e:
+                    for _, future, _ in live:
+                        future.set_exception(e)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                if live:
+                    self.tuner.observe(len(live), elapsed, len(self._heap))
+                for key, _, _ in batch:
+                    flow = self._flows[key]
+                    flow.running -= 1
+                    flow.completed += 1
+
+    def _batch_fn(self):
+        # Resolved on first use so benchmarks can swap in a stub before the model loads
+        if self.batch_fn is None:
+            from models.detector import detect_defects_batch
+            self.batch_fn = detect_defects_batch
+        return self.batch_fn
+
+    # ---------------- Introspection ----------------
+
+    def depths(self) -> List[dict]:
+        """Queued/running images per flow in this process, deepest first."""
+        with self._lock:
+            rows = [
+                {"activity_id": key, "weight": flow.weight, "queued": flow.queued,
+                 "running": flow.running, "completed": flow.completed}
+                for key, flow in self._flows.items()
+            ]
+        return sorted(rows, key=lambda row: row["queued"], reverse=True)
+
+    def stats(self) -> dict:
+        tuner = self.tuner
+        return {
+            "inference_workers": self.workers,
+            "queued": len(self._heap),
+            "max_queue": self.max_queue,
+            "batch_size": tuner.batch_size,
+            "flush_timeout_ms": round(tuner.flush_timeout * 1000, 2),
+            "batch_latency_ms": round(tuner.batch_latency * 1000, 2) if tuner.batch_latency is not None else None,
+            "latency_target_ms": round(tuner.target_s * 1000, 2),
+        }
+
+
+inference_scheduler = FairScheduler(INFERENCE_WORKERS)
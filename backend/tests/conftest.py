@@ -0,0 +1,26 @@
+"""
+Shared fixtures. The app modules read DATABASE_URL and the blob connection
+string at import, so point them at a throwaway SQLite file and the storage
+emulator before anything imports db.
+"""
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="defects-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+
+import pytest
+
+from db import Base, SessionLocal, engine
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
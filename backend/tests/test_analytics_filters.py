@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from analytics.controller import analytics_scope
+from analytics.service import AnalyticsFilter, AnalyticsService
+from db import Activity, ActivityImage
+
+
+def _raw_image(db, activity_id, created_at, detections):
+    # The layout created_at gets from server_default=func.now(): no microseconds
+    db.execute(
+        text("INSERT INTO activity_images (activity_id, filename, status, detections, created_at) "
+             "VALUES (:activity_id, :filename, 'defects_detected', :detections, :created_at)"),
+        {"activity_id": activity_id, "filename": f"{activity_id}-{created_at}", "created_at": created_at,
+         "detections": detections},
+    )
+    db.commit()
+
+
+@pytest.fixture
+def boundary(db):
+    db.add(Activity(id="a", name="a"))
+    db.commit()
+    _raw_image(db, "a", "2025-01-02 00:00:00", '[{"id": 0, "class": "scratch", "confidence": 0.9}]')
+    return db
+
+
+def _summary(db, **bounds):
+    scope = analytics_scope(bounds.get("date_from"), bounds.get("date_to"), None, None)
+    return AnalyticsService(db)._compute_summary(0.3, 0.7, scope)
+
+
+def _totals(summary):
+    return summary["total_images"], summary["total_defects"], summary["total_activities"]
+
+
+def test_inclusive_lower_bound_counts_the_row_everywhere(boundary):
+    assert _totals(_summary(boundary, date_from=datetime(2025, 1, 2))) == (1, 1, 1)
+    assert _totals(_summary(boundary, date_to=datetime(2025, 1, 2))) == (0, 0, 0)
+
+
+def test_offset_aware_bound_is_compared_in_utc(boundary):
+    # 01:00+05:00 is 20:00 UTC the day before
+    plus_five = timezone(timedelta(hours=5))
+    assert _totals(_summary(boundary, date_to=datetime(2025, 1, 2, 1, tzinfo=plus_five))) == (0, 0, 0)
+    assert _totals(_summary(boundary, date_from=datetime(2025, 1, 2, 1, tzinfo=plus_five))) == (1, 1, 1)
+
+
+def test_scope_normalizes_mixed_offsets():
+    scope = analytics_scope(datetime(2025, 1, 1), datetime(2025, 1, 2, 3, tzinfo=timezone(timedelta(hours=5))), None, None)
+    assert scope.date_from == datetime(2025, 1, 1)
+    assert scope.date_to == datetime(2025, 1, 1, 22)
+
+
+def test_scope_rejects_reversed_range():
+    with pytest.raises(HTTPException) as raised:
+        # 10:00+05:00 is 05:00 UTC, before 06:00 naive (UTC)
+        analytics_scope(datetime(2025, 1, 1, 6), datetime(2025, 1, 1, 10, tzinfo=timezone(timedelta(hours=5))), None, None)
+    assert raised.value.status_code == 422
+
+
+def test_activity_and_class_filters(db):
+    db.add_all([Activity(id="a", name="a"), Activity(id="b", name="b")])
+    db.add_all([
+        ActivityImage(activity_id="a", filename="1", status="defects_detected", created_at=datetime(2025, 1, 1),
+                      detections=[{"id": 0, "class": "scratch", "confidence": 0.9},
+                                  {"id": 1, "class": "dent", "confidence": 0.5}]),
+        ActivityImage(activity_id="b", filename="2", status="defects_detected", created_at=datetime(2025, 1, 1),
+                      detections=[{"id": 0, "class": "scratch", "confidence": 0.1}]),
+    ])
+    db.commit()
+    service = AnalyticsService(db)
+
+    only_a = service._compute_summary(0.3, 0.7, AnalyticsFilter.build(activity_ids=["a"]))
+    assert _totals(only_a) == (1, 2, 1)
+
+    scratches = service._compute_summary(0.3, 0.7, AnalyticsFilter.build(classes=["scratch"]))
+    assert _totals(scratches) == (2, 2, 2)
+    assert scratches["defect_severity_distribution"] == {"low": 1, "medium": 0, "high": 1}
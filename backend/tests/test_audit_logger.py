@@ -0,0 +1,55 @@
+import os
+
+from utils import logger
+from utils.logger import AuditLogger
+
+
+def _lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_lines_are_written_in_order(tmp_path):
+    path = str(tmp_path / "audit.log")
+    audit = AuditLogger()
+    for i in range(50):
+        audit.log(f"line {i}", path)
+    assert audit.flush()
+    assert [line.split(" - ", 1)[1] for line in _lines(path)] == [f"line {i}" for i in range(50)]
+    audit.shutdown()
+
+
+def test_rotation_keeps_backup_count_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, "AUDIT_MAX_BYTES", 100)
+    monkeypatch.setattr(logger, "AUDIT_BACKUP_COUNT", 2)
+    path = str(tmp_path / "audit.log")
+    audit = AuditLogger()
+    for i in range(10):
+        audit.log("x" * 80, path)
+        audit.flush()
+    audit.shutdown()
+    assert sorted(os.listdir(tmp_path)) == ["audit.log", "audit.log.1", "audit.log.2", "audit.log.lock"]
+
+
+def test_zero_backups_truncates_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, "AUDIT_MAX_BYTES", 100)
+    monkeypatch.setattr(logger, "AUDIT_BACKUP_COUNT", 0)
+    path = str(tmp_path / "audit.log")
+    audit = AuditLogger()
+    for i in range(10):
+        audit.log(f"{i} " + "x" * 80, path)
+        audit.flush()
+    audit.shutdown()
+    assert sorted(os.listdir(tmp_path)) == ["audit.log", "audit.log.lock"]
+    assert os.path.getsize(path) < 100
+
+
+def test_logging_after_shutdown_writes_synchronously(tmp_path):
+    path = str(tmp_path / "audit.log")
+    audit = AuditLogger()
+    audit.log("before", path)
+    audit.shutdown()
+
+    audit.log("after", path)
+    assert audit._thread is None
+    assert [line.split(" - ", 1)[1] for line in _lines(path)] == ["before", "after"]
@@ -0,0 +1,47 @@
+from fastapi import Response
+from starlette.requests import Request
+
+from utils.etag import conditional_response, etag_matches, make_etag
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_make_etag_is_weak_and_stable():
+    etag = make_etag("activity", "a", 3)
+    assert etag.startswith('W/"')
+    assert etag == make_etag("activity", "a", 3)
+    assert etag != make_etag("activity", "a", 4)
+
+
+def test_etag_matches_weak_lists_and_star():
+    etag = make_etag("x")
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_conditional_response_skips_produce_on_match():
+    etag = make_etag("x")
+    calls = []
+    result = conditional_response(_request(etag), Response(), etag, lambda: calls.append(1))
+    assert result.status_code == 304
+    assert result.headers["etag"] == etag
+    assert not calls
+
+
+def test_conditional_response_attaches_etag_on_miss():
+    etag = make_etag("x")
+    response = Response()
+    assert conditional_response(_request('"stale"'), response, etag, lambda: {"ok": True}) == {"ok": True}
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_conditional_response_without_etag_just_produces():
+    assert conditional_response(_request("*"), Response(), None, lambda: "body") == "body"
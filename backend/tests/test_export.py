@@ -0,0 +1,65 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from activity.controller import export_detections_stream
+from activity.export import CSV_COLUMNS, export_detections
+from db import Activity, ActivityImage
+
+
+@pytest.fixture
+def images(db):
+    db.add_all([Activity(id="a", name="a"), Activity(id="b", name="b")])
+    db.add_all([
+        ActivityImage(activity_id="a", filename="1", status="defects_detected", created_at=datetime(2025, 1, 1, 12),
+                      detections=[{"id": 0, "class": "scratch", "confidence": 0.9, "bbox": {"x1": 1, "y1": 2, "x2": 3, "y2": 4}},
+                                  {"id": 1, "class": "dent", "confidence": 0.4}]),
+        ActivityImage(activity_id="b", filename="2", status="defects_detected", created_at=datetime(2025, 1, 2, 12),
+                      detections=[{"id": 0, "class": "scratch", "confidence": 0.6}]),
+        ActivityImage(activity_id="b", filename="3", status="pending", created_at=datetime(2025, 1, 3, 12)),
+    ])
+    db.commit()
+    return db
+
+
+def _ndjson(**kwargs):
+    body = b"".join(export_detections("ndjson", **kwargs))
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_ndjson_has_one_line_per_detection(images):
+    rows = _ndjson()
+    assert [(row["filename"], row["detection_id"]) for row in rows] == [("1", 0), ("1", 1), ("2", 0)]
+    assert rows[0]["x1"] == 1 and rows[1]["x1"] is None
+
+
+def test_activity_and_date_filters(images):
+    assert {row["activity_id"] for row in _ndjson(activity_ids=["b"])} == {"b"}
+    # [from, to): the bound at 12:00 on the 2nd excludes image 2
+    rows = _ndjson(date_from=datetime(2025, 1, 1), date_to=datetime(2025, 1, 2, 12))
+    assert {row["filename"] for row in rows} == {"1"}
+
+
+def test_csv_with_gzip(images):
+    body = gzip.decompress(b"".join(export_detections("csv", compress=True)))
+    reader = csv.DictReader(io.StringIO(body.decode()))
+    assert reader.fieldnames == CSV_COLUMNS
+    assert len(list(reader)) == 3
+
+
+def test_endpoint_accepts_mixed_offsets():
+    plus_five = timezone(timedelta(hours=5))
+    response = export_detections_stream("ndjson", None, datetime(2025, 1, 1), datetime(2025, 1, 2, tzinfo=plus_five), False)
+    assert response.media_type == "application/x-ndjson"
+
+
+def test_endpoint_rejects_reversed_range():
+    plus_five = timezone(timedelta(hours=5))
+    with pytest.raises(HTTPException) as raised:
+        export_detections_stream("ndjson", None, datetime(2025, 1, 1, 22), datetime(2025, 1, 2, 2, tzinfo=plus_five), False)
+    assert raised.value.status_code == 422
@@ -0,0 +1,160 @@
+import random
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from analytics.incremental import IncrementalSummary, _Aggregate, incremental_summary, reset_incremental_analytics
+from analytics.service import AnalyticsService
+from db import Activity, ActivityImage
+
+THRESHOLDS = (0.3, 0.7)
+
+
+def _totals(rows):
+    totals = defaultdict(lambda: [0, 0, 0])
+    for activity_id, day, *counts in rows:
+        for k in range(3):
+            totals[(activity_id, day)][k] += counts[k]
+    return {key: value for key, value in totals.items() if any(value)}
+
+
+@pytest.fixture
+def seeded(db):
+    rng = random.Random(7)
+    for activity_id in ("a1", "a2"):
+        db.add(Activity(id=activity_id, name=activity_id))
+    db.commit()
+
+    def add(count, status):
+        for _ in range(count):
+            detections = None if status == "pending" else [
+                {"id": k, "class": "scratch", "confidence": rng.random()} for k in range(rng.randint(0, 3))
+            ]
+            db.add(ActivityImage(
+                activity_id=rng.choice(["a1", "a2"]), filename=f"f{rng.random()}", status=status,
+                detections=detections, created_at=datetime(2025, 1, rng.randint(1, 3), 12),
+            ))
+        db.commit()
+
+    return db, add
+
+
+def _parity(db, summary):
+    service = AnalyticsService(db)
+    return _totals(summary.grouped_counts(service, *THRESHOLDS)) == _totals(service._grouped_counts(*THRESHOLDS))
+
+
+def test_matches_grouped_counts_as_rows_arrive_and_finish(seeded):
+    db, add = seeded
+    summary = IncrementalSummary()
+    add(50, "defects_detected")
+    add(3, "pending")
+    assert _parity(db, summary)
+
+    add(20, "no_defects")
+    add(2, "processing")
+    assert _parity(db, summary)
+
+    for image in db.query(ActivityImage).filter_by(status="pending").limit(2):
+        image.status = "defects_detected"
+        image.detections = [{"id": 0, "class": "scratch", "confidence": 0.9}]
+    db.commit()
+    assert _parity(db, summary)
+
+
+def test_watermark_advances_past_orphaned_rows(seeded):
+    db, add = seeded
+    summary = IncrementalSummary()
+    add(1, "pending")
+    add(10, "no_defects")
+    assert _parity(db, summary)
+
+    aggregate = summary._aggregate(*THRESHOLDS)
+    assert aggregate.watermark == db.query(ActivityImage.id).order_by(ActivityImage.id.desc()).first()[0]
+    assert len(aggregate.in_flight) == 1
+
+
+def test_periodic_check_rebuilds_after_deletes_behind_its_back(seeded):
+    db, add = seeded
+    summary = IncrementalSummary(check_interval_s=0)
+    add(30, "defects_detected")
+    assert _parity(db, summary)
+
+    # Not through forget_activity(), so only the consistency check can notice
+    db.query(ActivityImage).filter(ActivityImage.id.in_([5, 6])).delete()
+    db.commit()
+    assert _parity(db, summary)
+
+
+def test_checksum_notices_ids_swapped_under_the_watermark(seeded):
+    db, add = seeded
+    summary = IncrementalSummary()
+    add(10, "defects_detected")
+    assert _parity(db, summary)
+    aggregate = summary._aggregate(*THRESHOLDS)
+
+    # Same count, different rows
+    db.query(ActivityImage).filter(ActivityImage.id == 5).update({ActivityImage.id: 0})
+    db.commit()
+    assert not aggregate.consistent(db)
+
+
+def test_refolds_rows_reset_and_synced_again(seeded):
+    db, add = seeded
+    # The commit hook marks the process-wide aggregates
+    reset_incremental_analytics()
+    summary = incremental_summary
+    add(10, "defects_detected")
+    add(1, "error")
+    assert _parity(db, summary)
+    failed = db.query(ActivityImage).filter_by(status="error").one()
+
+    # The documented retry: back to pending with a bulk update, then a sync finishes it again
+    db.query(ActivityImage).filter(ActivityImage.id == failed.id).update({"status": "pending", "attempts": 0})
+    db.commit()
+    db.refresh(failed)
+    failed.status = "defects_detected"
+    failed.detections = [{"id": 0, "class": "scratch", "confidence": 0.95}]
+    db.commit()
+    assert _parity(db, summary)
+
+
+def test_rebuilds_when_a_folded_row_goes_back_to_pending(seeded):
+    db, add = seeded
+    reset_incremental_analytics()
+    summary = incremental_summary
+    add(10, "defects_detected")
+    assert _parity(db, summary)
+
+    db.query(ActivityImage).filter(ActivityImage.id == 3).update({"status": "pending", "detections": None})
+    db.commit()
+    assert _parity(db, summary)
+    assert 3 in summary._aggregate(*THRESHOLDS).in_flight
+
+
+def test_rebuilds_after_an_orm_delete_of_a_folded_row(seeded):
+    db, add = seeded
+    reset_incremental_analytics()
+    summary = incremental_summary
+    add(10, "defects_detected")
+    assert _parity(db, summary)
+
+    db.delete(db.get(ActivityImage, 4))
+    db.commit()
+    assert _parity(db, summary)
+
+
+def test_requests_do_not_recount_history(seeded, monkeypatch):
+    db, add = seeded
+    summary = IncrementalSummary(check_interval_s=3600)
+    add(10, "defects_detected")
+    assert _parity(db, summary)
+
+    def recount(self, db):
+        raise AssertionError("full recount on a request")
+
+    monkeypatch.setattr(_Aggregate, "consistent", recount)
+    add(5, "no_defects")
+    add(1, "pending")
+    assert _parity(db, summary)
@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from config.settings import METRICS_ENABLED
+from utils.metrics import REQUEST_METRIC, render_metrics
+
+pytestmark = pytest.mark.skipif(not METRICS_ENABLED, reason="METRICS_ENABLED=false")
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main import app
+
+    def boom():
+        raise RuntimeError("route failed")
+
+    def ok():
+        return {"images": list(range(3))}
+
+    app.add_api_route("/_test/boom", boom)
+    app.add_api_route("/_test/ok", ok)
+    try:
+        yield TestClient(app, raise_server_exceptions=False)
+    finally:
+        app.router.routes = [r for r in app.router.routes if not getattr(r, "path", "").startswith("/_test/")]
+
+
+def test_failing_route_is_recorded_as_500(client):
+    assert client.get("/_test/boom").status_code == 500
+    assert f'{REQUEST_METRIC}_count{{method="GET",path="/_test/boom",status="500"}} 1' in render_metrics()
+
+
+def test_successful_route_gets_server_timing_with_serialize(client):
+    response = client.get("/_test/ok")
+    assert response.json() == {"images": [0, 1, 2]}
+    assert "serialize;dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
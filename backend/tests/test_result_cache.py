@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from analytics.cache import ResultCache
+
+
+def test_hit_within_ttl_and_miss_after_invalidate():
+    cache = ResultCache(maxsize=10, ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_compute("k", compute) == 1
+    assert cache.get_or_compute("k", compute) == 1
+    cache.invalidate()
+    assert cache.get_or_compute("k", compute) == 2
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_expired_entries_are_recomputed():
+    cache = ResultCache(maxsize=10, ttl=0.01)
+    calls = []
+    cache.get_or_compute("k", lambda: calls.append(1))
+    time.sleep(0.02)
+    cache.get_or_compute("k", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2, ttl=60)
+    for key in ("a", "b"):
+        cache.get_or_compute(key, lambda: key)
+    cache.get_or_compute("a", lambda: "recomputed")   # a is now the most recent
+    cache.get_or_compute("c", lambda: "c")
+    assert cache.get_or_compute("a", lambda: "recomputed") == "a"
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache(maxsize=10, ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache(maxsize=10, ttl=60)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+import models.scheduler as scheduler_module
+from models.scheduler import BatchTuner, FairScheduler
+
+
+def _scheduler(batch_fn):
+    # One image per batch, no flush wait: dispatch order is exactly the fair-queuing order
+    return FairScheduler(workers=1, batch_fn=batch_fn, max_queue=1000, tuner=BatchTuner(1.0, 1, 0.0))
+
+
+def _blocked_scheduler():
+    """Scheduler whose first batch blocks until `release` is set, so the rest can queue up."""
+    release = threading.Event()
+    order = []
+
+    def batch_fn(images, render):
+        if images == [b"blocker"]:
+            release.wait(5)
+        else:
+            order.extend(images)
+        return [{"detections": []} for _ in images]
+
+    scheduler = _scheduler(batch_fn)
+    blocker = scheduler.submit("blocker", 1, b"blocker")
+    # Until the worker holds it the blocker still moves the virtual clock, and with it the tags
+    while scheduler.stats()["queued"]:
+        time.sleep(0.001)
+    return scheduler, blocker, release, order
+
+
+def test_dispatch_share_follows_weight():
+    scheduler, blocker, release, order = _blocked_scheduler()
+    futures = [scheduler.submit("low", 1, b"low") for _ in range(10)]
+    futures += [scheduler.submit("high", 3, b"high") for _ in range(10)]
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+
+    first = order[:8]
+    assert first.count(b"high") == 6
+    assert first.count(b"low") == 2
+    assert len(order) == 20
+
+
+def test_backlog_does_not_starve_a_small_flow():
+    scheduler, blocker, release, order = _blocked_scheduler()
+    futures = [scheduler.submit("big", 1, b"big") for _ in range(50)]
+    futures.append(scheduler.submit("small", 1, b"small"))
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+
+    assert order.index(b"small") <= 1
+
+
+def test_idle_flows_are_pruned_on_submit():
+    scheduler = _scheduler(lambda images, render: [{"detections": []} for _ in images])
+    scheduler.submit("a", 1, b"x").result(timeout=5)
+    scheduler.submit("b", 1, b"y").result(timeout=5)
+
+    assert "a" not in {row["activity_id"] for row in scheduler.depths()}
+
+
+def test_batch_error_fails_every_future():
+    def batch_fn(images, render):
+        raise RuntimeError("model crashed")
+
+    scheduler = _scheduler(batch_fn)
+    future = scheduler.submit("a", 1, b"x")
+    with pytest.raises(RuntimeError, match="model crashed"):
+        future.result(timeout=5)
+
+
+def test_tuner_grows_with_backlog_and_halves_when_slow():
+    tuner = BatchTuner(target_s=0.5, max_batch=8, max_wait_s=0.02)
+    for _ in range(5):
+        tuner.observe(tuner.batch_size, 0.01 * tuner.batch_size, backlog=100)
+    assert tuner.batch_size == 6
+
+    tuner.observe(tuner.batch_size, 1.0, backlog=100)
+    assert tuner.batch_size == 3
+
+
+def test_short_batch_result_fails_the_futures():
+    scheduler = _scheduler(lambda images, render: [])
+    future = scheduler.submit("a", 1, b"x")
+    with pytest.raises(RuntimeError, match="0 results for a batch of 1"):
+        future.result(timeout=5)
+
+
+def test_full_queue_submit_calls_on_wait_and_times_out(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "_FULL_QUEUE_POLL_S", 0.01)
+    release = threading.Event()
+
+    def batch_fn(images, render):
+        release.wait(5)
+        return [{"detections": []} for _ in images]
+
+    scheduler = FairScheduler(workers=1, batch_fn=batch_fn, max_queue=1, tuner=BatchTuner(1.0, 1, 0.0))
+    running = scheduler.submit("a", 1, b"running")
+    while scheduler.stats()["queued"]:     # wait until the worker holds it
+        time.sleep(0.001)
+    queued = scheduler.submit("a", 1, b"queued")
+
+    ticks = []
+    with pytest.raises(TimeoutError):
+        scheduler.submit("b", 1, b"blocked", on_wait=lambda: ticks.append(1), timeout=0.05)
+    assert ticks
+
+    release.set()
+    for future in (running, queued):
+        future.result(timeout=5)
+
+
+def test_batched_dispatch_share_follows_weight():
+    release = threading.Event()
+    batches = []
+
+    def batch_fn(images, render):
+        if images == [b"blocker"]:
+            release.wait(5)
+        else:
+            batches.append(images)
+        return [{"detections": []} for _ in images]
+
+    tuner = BatchTuner(1.0, 6, 0.0)
+    scheduler = FairScheduler(workers=1, batch_fn=batch_fn, max_queue=1000, tuner=tuner)
+    blocker = scheduler.submit("blocker", 1, b"blocker")
+    while scheduler.stats()["queued"]:     # wait until the worker holds it
+        time.sleep(0.001)
+    tuner.batch_size = 6
+    futures = [scheduler.submit("low", 1, b"low") for _ in range(60)]
+    futures += [scheduler.submit("high", 5, b"high") for _ in range(60)]
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+
+    # While both flows have a full batch queued, every batch splits 1:5
+    saturated = [image for batch in batches[:10] for image in batch]
+    assert saturated.count(b"high") == 5 * saturated.count(b"low")
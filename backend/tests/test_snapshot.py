@@ -0,0 +1,86 @@
+import os
+from datetime import datetime
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from analytics.snapshot import load_state, run_snapshot, save_state
+from db import DATABASE_URL, Activity, ActivityImage
+
+
+def _add(db, count, status="defects_detected", month=1):
+    for _ in range(count):
+        db.add(ActivityImage(
+            activity_id="a", filename=f"f{db.query(ActivityImage).count()}", status=status,
+            created_at=datetime(2025, month, 1, 12),
+            detections=[{"id": 0, "class": "scratch", "confidence": 0.9, "bbox": {"x1": 0, "y1": 0, "x2": 1, "y2": 1}}],
+        ))
+        db.commit()
+
+
+def _exported_ids(export_dir):
+    table = pq.read_table(os.path.join(export_dir, "images"))
+    return sorted(table.column("image_id").to_pylist())
+
+
+@pytest.fixture
+def activity(db):
+    db.add(Activity(id="a", name="a"))
+    db.commit()
+    return db
+
+
+def test_incremental_runs_append_new_rows_only(activity, tmp_path):
+    db, export_dir = activity, str(tmp_path)
+    _add(db, 3, month=1)
+    first = run_snapshot(DATABASE_URL, export_dir)
+    assert (first["images"], first["detections"]) == (3, 3)
+
+    _add(db, 2, month=2)
+    second = run_snapshot(DATABASE_URL, export_dir)
+    assert (second["from_image_id"], second["images"]) == (3, 2)
+    assert _exported_ids(export_dir) == [1, 2, 3, 4, 5]
+    assert os.path.isdir(os.path.join(export_dir, "images", "month=2025-02"))
+
+    assert run_snapshot(DATABASE_URL, export_dir)["images"] == 0
+    assert _exported_ids(export_dir) == [1, 2, 3, 4, 5]
+
+
+def test_stops_before_an_unfinished_row(activity, tmp_path):
+    db, export_dir = activity, str(tmp_path)
+    _add(db, 2)
+    _add(db, 1, status="processing")
+    _add(db, 2)
+    result = run_snapshot(DATABASE_URL, export_dir)
+    assert result["to_image_id"] == 2
+    assert result["blocked_by"]["image_id"] == 3
+    assert load_state(export_dir)["last_image_id"] == 2
+
+
+def test_exported_row_reset_later_does_not_block(activity, tmp_path):
+    db, export_dir = activity, str(tmp_path)
+    _add(db, 3)
+    run_snapshot(DATABASE_URL, export_dir)
+
+    db.query(ActivityImage).filter(ActivityImage.id == 2).update({"status": "pending"})
+    db.commit()
+    _add(db, 2)
+    result = run_snapshot(DATABASE_URL, export_dir)
+    assert result["blocked_by"] is None
+    assert _exported_ids(export_dir) == [1, 2, 3, 4, 5]
+
+
+def test_rerun_after_a_crash_does_not_duplicate(activity, tmp_path):
+    db, export_dir = activity, str(tmp_path)
+    _add(db, 3)
+    run_snapshot(DATABASE_URL, export_dir)
+    _add(db, 2)
+    run_snapshot(DATABASE_URL, export_dir)
+
+    # Lose the second run's state, as if it crashed after writing its parts
+    state = load_state(export_dir)
+    state["last_image_id"] = 3
+    save_state(export_dir, state)
+    run_snapshot(DATABASE_URL, export_dir)
+    assert _exported_ids(export_dir) == [1, 2, 3, 4, 5]
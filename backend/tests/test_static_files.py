@@ -0,0 +1,36 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config.settings import STATIC_MAX_AGE
+from utils.static_files import IMMUTABLE_CACHE_CONTROL, CachedStaticFiles, content_hashed_name, is_content_hashed
+
+
+def _client(directory):
+    app = FastAPI()
+    app.mount("/demo_images", CachedStaticFiles(directory=str(directory)), name="demo_images")
+    return TestClient(app)
+
+
+def test_hashed_name_is_immutable_and_plain_name_revalidates(tmp_path):
+    hashed = content_hashed_name("annotated_image1.png", b"annotated bytes")
+    (tmp_path / hashed).write_bytes(b"annotated bytes")
+    (tmp_path / "image1.png").write_bytes(b"original bytes")
+    client = _client(tmp_path)
+
+    response = client.get(f"/demo_images/{hashed}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+    response = client.get("/demo_images/image1.png")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == f"public, max-age={STATIC_MAX_AGE}"
+
+
+def test_content_hashed_name_follows_the_bytes():
+    first = content_hashed_name("annotated_image1.png", b"a")
+    assert is_content_hashed(first)
+    assert first.startswith("annotated_image1.") and first.endswith(".png")
+    assert first == content_hashed_name("annotated_image1.png", b"a")
+    assert first != content_hashed_name("annotated_image1.png", b"b")
+    assert not is_content_hashed("20251119.jpg")
+    assert not is_content_hashed("cafebabe.png")
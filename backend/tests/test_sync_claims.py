@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from activity.service import _claim_chunk, _fail_image, _heartbeat, _register_pending
+from config.settings import SYNC_MAX_ATTEMPTS
+from db import Activity, ActivityImage, SessionLocal, get_data_revision
+
+
+def _activity(db, count):
+    db.add(Activity(id="a", name="a"))
+    db.commit()
+    _register_pending(db, "a", [f"img_{i}.png" for i in range(count)])
+
+
+def test_register_pending_is_idempotent(db):
+    _activity(db, 5)
+    assert _register_pending(db, "a", [f"img_{i}.png" for i in range(7)]) == 2
+    assert db.query(ActivityImage).count() == 7
+
+
+def test_concurrent_claims_are_exclusive(db):
+    _activity(db, 200)
+    claimed = {}
+    errors = []
+
+    def worker(owner):
+        session = SessionLocal()
+        try:
+            mine = []
+            while True:
+                images, _ = _claim_chunk(session, "a", owner, 7)
+                if not images:
+                    break
+                mine += [image.id for image in images]
+            claimed[owner] = mine
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    ids = [image_id for mine in claimed.values() for image_id in mine]
+    assert len(ids) == len(set(ids)) == 200
+    owners = dict(db.query(ActivityImage.id, ActivityImage.lease_owner))
+    assert all(owners[image_id] == owner for owner, mine in claimed.items() for image_id in mine)
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db):
+    _activity(db, 3)
+    images, resumed = _claim_chunk(db, "a", "dead", 2)
+    assert len(images) == 2 and resumed == 0
+
+    # Still leased: the other worker only gets the row nobody holds
+    images, resumed = _claim_chunk(db, "a", "alive", 10)
+    assert len(images) == 1 and resumed == 0
+
+    db.query(ActivityImage).filter_by(lease_owner="dead").update(
+        {ActivityImage.lease_expires_at: datetime.now(timezone.utc) - timedelta(seconds=1)},
+        synchronize_session=False,
+    )
+    db.commit()
+    images, resumed = _claim_chunk(db, "a", "alive", 10)
+    assert len(images) == 2 and resumed == 2
+    assert {image.lease_owner for image in images} == {"alive"}
+
+
+def test_heartbeat_extends_leases_without_a_revision(db):
+    _activity(db, 2)
+    images, _ = _claim_chunk(db, "a", "w", 2)
+    expires = {image.id: image.lease_expires_at for image in images}
+    revision = get_data_revision(db)
+
+    _heartbeat(db, "w")
+    db.expire_all()
+    assert get_data_revision(db) == revision
+    assert all(image.lease_expires_at >= expires[image.id] for image in db.query(ActivityImage))
+
+
+def test_failed_image_backs_off_then_gives_up(db):
+    _activity(db, 1)
+    for attempt in range(1, SYNC_MAX_ATTEMPTS + 1):
+        images, _ = _claim_chunk(db, "a", "w", 1)
+        assert len(images) == 1
+        final = _fail_image(db, images[0], RuntimeError("boom"))
+        assert images[0].attempts == attempt
+        assert final == (attempt == SYNC_MAX_ATTEMPTS)
+        # Waiting out the back-off
+        assert _claim_chunk(db, "a", "w", 1) == ([], 0)
+        if not final:
+            images[0].retry_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            db.commit()
+
+    assert images[0].status == "error"
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from activity import service
+from activity.service import ANNOTATED_PREFIX, ORIGINAL_PREFIX
+from benchmarks.sync_load_test import LocalContainerClient
+from db import Activity, ActivityImage
+
+DETECTIONS = [{"id": 0, "class": "scratch", "confidence": 0.9}]
+
+
+@pytest.fixture
+def container(monkeypatch):
+    container = LocalContainerClient()
+    container._write(f"{ORIGINAL_PREFIX}img.png", b"original")
+    monkeypatch.setattr(service, "container_client", container)
+    monkeypatch.setattr(service, "ANNOTATION_MODE", "eager")
+
+    def detector(*args, **kwargs):
+        raise AssertionError("detector called for a row with stored detections")
+
+    monkeypatch.setattr(service.inference_scheduler, "submit", detector)
+    monkeypatch.setattr(service, "render_annotated", detector)
+    return container
+
+
+def _abandoned_row(db, **columns):
+    """A row whose worker died after storing the detections."""
+    db.add(Activity(id="a", name="a"))
+    db.add(ActivityImage(
+        activity_id="a", filename="img.png", status="processing", detections=DETECTIONS,
+        lease_owner="dead", lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+        original_blob_url="http://localblob/images/original/img.png", **columns,
+    ))
+    db.commit()
+
+
+def test_reclaimed_row_reuses_stored_detections(db, container, monkeypatch):
+    monkeypatch.setattr(service, "THUMBNAILS_ENABLED", True)
+    container._write(f"{ANNOTATED_PREFIX}img.png", b"annotated")
+    _abandoned_row(db, original_thumb_url="t/original", annotated_thumb_url="t/annotated")
+
+    downloads = []
+    read = container._read
+    monkeypatch.setattr(container, "_read", lambda name: downloads.append(name) or read(name))
+
+    response = service.sync_images(db, "a")
+    assert response["resumed_images"] == 1 and response["processed_images"] == 1
+
+    image = db.query(ActivityImage).one()
+    assert image.status == "defects_detected"
+    assert image.detections == DETECTIONS
+    assert image.high_defects == 1
+    assert image.annotated_blob_url == container.get_blob_client(f"{ANNOTATED_PREFIX}img.png").url
+    assert image.annotated_thumb_url == "t/annotated"
+    # exists() says it is uploaded; with both thumbnails in place nothing is downloaded
+    assert downloads == []
+
+
+def test_reclaimed_row_renders_when_the_annotated_blob_is_missing(db, container, monkeypatch):
+    monkeypatch.setattr(service, "THUMBNAILS_ENABLED", False)
+    monkeypatch.setattr(service, "render_annotated", lambda image_bytes, detections: b"rendered")
+    _abandoned_row(db)
+
+    service.sync_images(db, "a")
+
+    image = db.query(ActivityImage).one()
+    assert image.status == "defects_detected"
+    assert container._read(f"{ANNOTATED_PREFIX}img.png") == b"rendered"
@@ -0,0 +1,49 @@
+"""
+Conditional GET helpers.
+
+ETags are built from version numbers the caller already has (row revisions,
+config version), so answering If-None-Match costs one cheap lookup instead
+of running the query and serializing the response.
+"""
+import hashlib
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" matches "x"
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def conditional_response(request: Request, response: Response, etag: Optional[str], produce: Callable):
+    """
+    304 when the request's If-None-Match matches `etag`, otherwise produce()
+    with the ETag attached. etag=None (e.g. unknown resource) just calls produce().
+    """
+    if etag is None:
+        return produce()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}   # cache, but revalidate every time
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = produce()
+    # Endpoints returning a Response directly bypass the injected one
+    target = content if isinstance(content, Response) else response
+    target.headers.update(headers)
+    return content
@@ -0,0 +1,45 @@
+"""
+Opt-in fast JSON responses for large, trusted service output.
+
+Returning a Response from an endpoint makes FastAPI skip response_model
+validation and jsonable_encoder, which for an activity with thousands of
+images costs more than the database query. The service dicts already have
+the response_model's shape, so they are encoded directly: orjson when
+installed, else pydantic_core's encoder. Datetimes are written the way
+pydantic writes them (ISO 8601, UTC as "Z"), so clients see the same JSON.
+
+The response_model stays on the route for the OpenAPI schema.
+"""
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic_core import to_json
+
+from config.settings import FAST_JSON_RESPONSES
+from utils.metrics import span
+
+try:
+    import orjson
+except ImportError:   # optional: pip install orjson
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return to_json(content)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
+
+
+def fast_response(content: Any):
+    """Wrap service output in a FastJSONResponse when FAST_JSON_RESPONSES is on, else return it as is."""
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(content)
+    return content
@@ -0,0 +1,60 @@
+import os
+from io import BytesIO
+from PIL import Image
+from config.settings import (
+    ANNOTATED_FORMAT,
+    ANNOTATED_QUALITY,
+    ANNOTATED_COMPRESS_LEVEL,
+    THUMBNAIL_SIZE,
+    THUMBNAIL_FORMAT,
+    THUMBNAIL_QUALITY,
+)
+
+CONTENT_TYPES = {
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+}
+
+EXTENSIONS = {
+    "PNG": ".png",
+    "WEBP": ".webp",
+    "JPEG": ".jpg",
+}
+
+
+def with_format_extension(filename, fmt=ANNOTATED_FORMAT):
+    """image1.png -> image1.webp for WEBP, so files served by extension get the right Content-Type."""
+    stem, _ = os.path.splitext(filename)
+    return f"{stem}{EXTENSIONS[fmt.upper()]}"
+
+
+def _save_options(fmt, quality, compress_level):
+    if fmt == "PNG":
+        return {"compress_level": compress_level}
+    if fmt == "WEBP":
+        return {"quality": quality, "method": min(compress_level, 6)}
+    if fmt == "JPEG":
+        return {"quality": quality}
+    raise ValueError(f"Unsupported image format: {fmt}")
+
+
+def encode_image(pil_image, fmt=ANNOTATED_FORMAT, quality=ANNOTATED_QUALITY, compress_level=ANNOTATED_COMPRESS_LEVEL):
+    """Encode a PIL image and return (bytes, content_type)."""
+    fmt = fmt.upper()
+    options = _save_options(fmt, quality, compress_level)
+    if fmt == "JPEG" and pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+
+    buf = BytesIO()
+    pil_image.save(buf, format=fmt, **options)
+    return buf.getvalue(), CONTENT_TYPES[fmt]
+
+
+def make_thumbnail(image_bytes, size=THUMBNAIL_SIZE, fmt=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+    """Downscale encoded image bytes so the longest side is `size`; returns (bytes, content_type)."""
+    image = Image.open(BytesIO(image_bytes))
+    image.draft("RGB", (size, size))   # JPEG: decode at reduced scale
+    image = image.convert("RGB")
+    image.thumbnail((size, size), resample=Image.BILINEAR)
+    return encode_image(image, fmt=fmt, quality=quality)
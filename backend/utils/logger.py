@@ -1,8 +1,280 @@
 from datetime import datetime
+import atexit
 import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+from config.settings import (
+    AUDIT_QUEUE_SIZE,
+    AUDIT_FLUSH_INTERVAL,
+    AUDIT_MAX_BYTES,
+    AUDIT_ROTATE_SECONDS,
+    AUDIT_BACKUP_COUNT,
+)
+
+_BATCH_SIZE = 1000
+
+
+class _AuditFile:
+    """
+    Open append handle for one log path, with size/age based rotation.
+
+    Every uvicorn worker appends to the same file. Writes and rotation happen
+    under an flock on "<path>.lock", and a handle whose file was rotated away
+    by another process is reopened before writing, so no process keeps
+    appending to audit.log.1.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_handle = None
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.handle = open(self.path, "a")
+        self.opened_at = time.monotonic()
+
+    def _lock(self):
+        if fcntl is None:   # Windows: single-process dev servers only
+            return
+        if self._lock_handle is None:
+            self._lock_handle = open(f"{self.path}.lock", "a")
+        fcntl.flock(self._lock_handle, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if self._lock_handle is not None:
+            fcntl.flock(self._lock_handle, fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.handle.fileno()).st_ino:
+            self.handle.close()
+            self._open()
+
+    def _should_rotate(self):
+        if AUDIT_MAX_BYTES and os.fstat(self.handle.fileno()).st_size >= AUDIT_MAX_BYTES:
+            return True
+        return bool(AUDIT_ROTATE_SECONDS) and time.monotonic() - self.opened_at >= AUDIT_ROTATE_SECONDS
+
+    def _rotate(self):
+        if AUDIT_BACKUP_COUNT <= 0:
+            # No backups to keep: empty the file in place. Same inode, so other
+            # workers' append handles stay valid and simply continue at offset 0
+            self.handle.truncate(0)
+            self.opened_at = time.monotonic()
+            return
+        self.handle.close()
+        # audit.log -> audit.log.1 -> ... -> audit.log.N (oldest dropped)
+        for i in range(AUDIT_BACKUP_COUNT - 1, 0, -1):
+            src, dst = f"{self.path}.{i}", f"{self.path}.{i + 1}"
+            if os.path.exists(src):
+                os.replace(src, dst)
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def write(self, lines):
+        self._lock()
+        try:
+            self._reopen_if_rotated()
+            self.handle.write("".join(lines))
+            self.handle.flush()
+            if self._should_rotate():
+                self._rotate()
+        finally:
+            self._unlock()
+
+    def close(self):
+        self.handle.close()
+        if self._lock_handle is not None:
+            self._lock_handle.close()
+
+
+class AuditLogger:
+    """
+    Non-blocking audit logger: callers enqueue lines, a background thread
+    batches them into long-lived file handles. When the queue is full new
+    lines are dropped and counted; the count is written once there is room.
+    After shutdown() lines are written synchronously instead, so late atexit
+    handlers still get logged without starting a new writer thread.
+    """
+
+    def __init__(self, maxsize=AUDIT_QUEUE_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._files = {}
+        self._dropped = {}
+        self._closed = False
+        self.written = 0
+        self.dropped_total = 0
+
+    def _ensure_started(self):
+        # Also restarts in a forked worker, where the parent's thread doesn't exist
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            self._files = {}
+            self._thread = threading.Thread(target=self._run, name="audit-logger", daemon=True)
+            self._thread.start()
+
+    def log(self, message, log_path):
+        line = f"{datetime.now().isoformat()} - {message}\n"
+        if self._closed:
+            self._write_sync(log_path, line)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((log_path, line))
+        except queue.Full:
+            with self._lock:
+                self._dropped[log_path] = self._dropped.get(log_path, 0) + 1
+                self.dropped_total += 1
+
+    def _run(self):
+        q = self._queue
+        while True:
+            try:
+                first = q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._write_dropped_notices()
+                continue
+
+            batch = [first]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._write_batch(batch)
+            self._write_dropped_notices()
+            if stop:
+                self._close_files()
+                return
+
+    def _write_batch(self, batch):
+        stop = False
+        by_path = {}
+        for item in batch:
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                continue
+            else:
+                by_path.setdefault(item[0], []).append(item[1])
+
+        for path, lines in by_path.items():
+            self._write(path, lines)
+
+        # Flush markers are released only after everything queued before them is written
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+        return stop
+
+    def _write(self, path, lines):
+        try:
+            audit_file = self._files.get(path)
+            if audit_file is None:
+                audit_file = self._files[path] = _AuditFile(path)
+            audit_file.write(lines)
+            self.written += len(lines)
+        except Exception:
+            # Never let logging take the writer down; the lines are lost
+            with self._lock:
+                self._dropped[path] = self._dropped.get(path, 0) + len(lines)
+                self.dropped_total += len(lines)
+
+    def _write_sync(self, path, line):
+        with self._lock:
+            audit_file = None
+            try:
+                audit_file = _AuditFile(path)
+                audit_file.write([line])
+                self.written += 1
+            except Exception:
+                self._dropped[path] = self._dropped.get(path, 0) + 1
+                self.dropped_total += 1
+            finally:
+                if audit_file is not None:
+                    audit_file.close()
+
+    def _write_dropped_notices(self):
+        with self._lock:
+            dropped, self._dropped = self._dropped, {}
+        for path, count in dropped.items():
+            self._write(path, [f"{datetime.now().isoformat()} - Audit logger dropped {count} lines (queue full)\n"])
+
+    def _close_files(self):
+        for audit_file in self._files.values():
+            audit_file.close()
+        self._files = {}
+
+    def flush(self, timeout=5.0):
+        """Block until everything logged so far is on disk. Returns False on timeout."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def shutdown(self, timeout=5.0):
+        self._closed = True
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped_total,
+        }
+
+
+_audit_logger = AuditLogger()
+atexit.register(_audit_logger.shutdown)
+
 
 def log_audit(message, log_path):
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    timestamp = datetime.now().isoformat()
-    with open(log_path, "a") as f:
-        f.write(f"{timestamp} - {message}\n")
+    _audit_logger.log(message, log_path)
+
+
+def flush_audit_log(timeout=5.0):
+    return _audit_logger.flush(timeout)
+
+
+def shutdown_audit_logger(timeout=5.0):
+    _audit_logger.shutdown(timeout)
+
+
+def audit_log_stats():
+    return _audit_logger.stats()
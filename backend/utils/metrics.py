@@ -0,0 +1,206 @@
+"""
+Lightweight timing spans aggregated into in-process histograms.
+
+    with span("blob_download"):
+        ...
+
+    @span("analytics_summary")
+    def get_summary(...): ...
+
+Every span feeds the sdd_span_duration_seconds histogram exposed at /metrics
+(Prometheus text format, per worker process) and, while a request is being
+handled, that request's Server-Timing header. With METRICS_ENABLED=false
+span() returns a shared no-op and decorated functions are left unwrapped.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from config.settings import METRICS_ENABLED
+from utils.logger import audit_log_stats
+from utils.profiler import current_request_profile
+
+# Upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans recorded during the current request: name -> total seconds
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}   # (name, help) -> {labels tuple: Histogram}
+
+    def histogram(self, name: str, help_text: str, labels: tuple) -> Histogram:
+        family = self._metrics.get((name, help_text))
+        if family is not None:
+            hist = family.get(labels)
+            if hist is not None:
+                return hist
+        with self._lock:
+            family = self._metrics.setdefault((name, help_text), {})
+            return family.setdefault(labels, Histogram())
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = [(key, dict(family)) for key, family in self._metrics.items()]
+        for (name, help_text), family in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in sorted(family.items()):
+                counts, total, count = hist.snapshot()
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                prefix = f"{label_str}," if label_str else ""
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                suffix = f"{{{label_str}}}" if label_str else ""
+                lines.append(f"{name}_sum{suffix} {total}")
+                lines.append(f"{name}_count{suffix} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = _Registry()
+
+SPAN_METRIC = "sdd_span_duration_seconds"
+SPAN_HELP = "Duration of instrumented stages"
+REQUEST_METRIC = "sdd_http_request_duration_seconds"
+REQUEST_HELP = "Duration of HTTP requests"
+
+
+class _Span:
+    __slots__ = ("name", "hist", "start", "profile")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hist = registry.histogram(SPAN_METRIC, SPAN_HELP, (("span", name),))
+        self.start = 0.0
+        self.profile = None
+
+    def __enter__(self):
+        # A request-scoped profiler samples the threads its spans run on
+        self.profile = current_request_profile()
+        if self.profile is not None:
+            self.profile.bind_current_thread()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.unbind_current_thread()
+        self.hist.observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __call__(self, fn):
+        return fn
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block (context manager) or a function (decorator) under `name`."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+# ---------------- Request integration ----------------
+
+def begin_request():
+    """Start collecting spans for the current request; returns a token for end_request()."""
+    return _request_timings.set({})
+
+
+def end_request(token, method: str, path: str, status: int, seconds: float) -> str:
+    """Record the request duration and return its Server-Timing header value."""
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    registry.histogram(
+        REQUEST_METRIC, REQUEST_HELP, (("method", method), ("path", path), ("status", str(status)))
+    ).observe(seconds)
+    parts = [f"{name};dur={value * 1000:.1f}" for name, value in timings.items()]
+    parts.append(f"total;dur={seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    The app's default response class: times JSON encoding of route results as
+    the 'serialize' span. response_model validation runs before the response
+    is built and stays in the request total.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+def _render_audit_counters() -> str:
+    stats = audit_log_stats()
+    return (
+        "# HELP sdd_audit_log_written_total Audit log lines written by this worker\n"
+        "# TYPE sdd_audit_log_written_total counter\n"
+        f"sdd_audit_log_written_total {stats['written']}\n"
+        "# HELP sdd_audit_log_dropped_total Audit log lines dropped because the queue was full\n"
+        "# TYPE sdd_audit_log_dropped_total counter\n"
+        f"sdd_audit_log_dropped_total {stats['dropped']}\n"
+        "# HELP sdd_audit_log_queued Audit log lines waiting to be written\n"
+        "# TYPE sdd_audit_log_queued gauge\n"
+        f"sdd_audit_log_queued {stats['queued']}\n"
+    )
+
+
+def render_metrics() -> str:
+    return registry.render() + _render_audit_counters()
@@ -0,0 +1,192 @@
+"""
+Low-overhead sampling profiler for a running worker.
+
+A daemon thread snapshots sys._current_frames() every `interval` seconds and
+counts identical stacks. Output is written in collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and
+inferno read directly.
+
+Two modes:
+  - worker-wide: start_profile(seconds) samples every thread for N seconds
+  - per-request: a request carrying the X-Profile-Request header, set to
+    PROFILE_REQUEST_SECRET, samples only the threads running that request's
+    instrumented spans (see utils.metrics). Disabled while the secret is
+    unset; one such profile runs at a time per worker.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from config.settings import PROFILE_DIR, PROFILE_REQUEST_SECRET
+
+PROFILE_HEADER = "X-Profile-Request"
+
+_request_profile: ContextVar[Optional["SamplingProfiler"]] = ContextVar("request_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, only_bound_threads: bool = False):
+        self.interval = interval
+        self.only_bound_threads = only_bound_threads
+        self.stacks = Counter()
+        self.samples = 0
+        self._bound = Counter()       # thread id -> active span depth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- thread binding (per-request mode) ----
+
+    def bind_current_thread(self):
+        with self._lock:
+            self._bound[threading.get_ident()] += 1
+
+    def unbind_current_thread(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self._bound[tid] -= 1
+            if self._bound[tid] <= 0:
+                del self._bound[tid]
+
+    # ---- sampling ----
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        if self.only_bound_threads:
+            with self._lock:
+                wanted = set(self._bound)
+        for tid, frame in sys._current_frames().items():
+            if tid == own or (self.only_bound_threads and tid not in wanted):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(tid, str(tid)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self, duration: Optional[float]):
+        deadline = None if duration is None else time.monotonic() + duration
+        while not self._stop.wait(self.interval):
+            self._sample()
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+    def start(self, duration: Optional[float] = None):
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def write(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def _output_path(label: str) -> str:
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return os.path.join(PROFILE_DIR, f"{stamp}-{label}.collapsed")
+
+
+# ---------------- Worker-wide sessions ----------------
+
+_session_lock = threading.Lock()
+_session = {"profiler": None, "output": None, "seconds": None}
+
+
+def start_profile(seconds: float, interval: float) -> str:
+    """Profile all threads of this worker for `seconds`; returns the output path. Raises RuntimeError if busy."""
+    with _session_lock:
+        current = _session["profiler"]
+        if current is not None and current.running:
+            raise RuntimeError("A profiling session is already running in this worker")
+
+        profiler = SamplingProfiler(interval=interval)
+        output = _output_path(f"worker{os.getpid()}")
+        _session.update(profiler=profiler, output=output, seconds=seconds)
+        profiler.start(duration=seconds)
+
+    def _finish():
+        profiler.wait()
+        profiler.write(output)
+
+    threading.Thread(target=_finish, name="sampling-profiler-writer", daemon=True).start()
+    return output
+
+
+def profile_status() -> dict:
+    with _session_lock:
+        profiler = _session["profiler"]
+        return {
+            "running": bool(profiler and profiler.running),
+            "output": _session["output"],
+            "seconds": _session["seconds"],
+            "samples": profiler.samples if profiler else 0,
+            "pid": os.getpid(),
+        }
+
+
+# ---------------- Per-request sessions ----------------
+
+_request_slot = threading.Lock()
+
+
+def request_profile_allowed(header_value: Optional[str]) -> bool:
+    if not PROFILE_REQUEST_SECRET or header_value is None:
+        return False
+    return hmac.compare_digest(header_value.encode(), PROFILE_REQUEST_SECRET.encode())
+
+
+def begin_request_profile(interval: float):
+    """Start profiling the current request; returns (profiler, token), or None while another request is profiled."""
+    if not _request_slot.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(interval=interval, only_bound_threads=True)
+    profiler.start()
+    return profiler, _request_profile.set(profiler)
+
+
+def end_request_profile(profiler: SamplingProfiler, token):
+    """Detach the profiler from the request. Call in the context begin_request_profile() ran in."""
+    _request_profile.reset(token)
+
+
+def write_request_profile(profiler: SamplingProfiler, label: Optional[str]) -> Optional[str]:
+    """Stop sampling, write the output (skipped when label is None) and free the slot. Blocking."""
+    try:
+        profiler.stop()
+        return profiler.write(_output_path(label)) if label is not None else None
+    finally:
+        _request_slot.release()
+
+
+def current_request_profile() -> Optional[SamplingProfiler]:
+    return _request_profile.get()
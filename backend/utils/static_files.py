@@ -0,0 +1,39 @@
+import hashlib
+import os
+import re
+
+from fastapi.staticfiles import StaticFiles
+
+from config.settings import STATIC_MAX_AGE
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# name.<hash>.ext only, with a hex hash of at least 16 characters: a bare hex
+# or date-like stem (20251119.jpg, cafebabe.png) is an ordinary, mutable name
+_HASHED_NAME = re.compile(r"^[^.]+(\.[^.]+)*\.[0-9a-fA-F]{16,}\.[A-Za-z0-9]+$")
+
+
+def is_content_hashed(path: str) -> bool:
+    return bool(_HASHED_NAME.search(os.path.basename(path)))
+
+
+def content_hashed_name(filename: str, data: bytes) -> str:
+    """annotated_image1.png -> annotated_image1.<sha256[:16]>.png, a name that is never reused for other bytes."""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with Cache-Control. Content-addressed files never change under
+    their name, so browsers may keep them for a year without revalidating;
+    everything else gets a short max-age and revalidates via ETag/Last-Modified.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if is_content_hashed(str(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+        return response